@@ -0,0 +1,113 @@
+"""Cold start benchmark for main.py
+
+Starts the app in a fresh interpreter under ``python -X importtime``, prints the
+slowest imports and the time until the first frame is drawn, and exits with
+status 1 if either is over budget. Without a display only the import budget is
+checked.
+
+    python bench_startup.py
+    python bench_startup.py --import-budget-ms 100 --frame-budget-ms 1000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the child interpreter. The app starts the way main() starts it, without
+# Chrome, and closes once the rest of the app has been built after the first
+# frame. frame_ms is taken when that deferred build begins.
+PROBE = """
+import json
+import time
+started = time.perf_counter()
+import main
+result = {'import_ms': (time.perf_counter() - started) * 1000}
+if %(gui)r:
+    main.load_gui_modules()
+    app = main.ModernMessengerExporter(prewarm=False)
+    finish_startup = app._finish_startup
+
+    def measured_finish_startup():
+        result['frame_ms'] = (time.perf_counter() - started) * 1000
+        finish_startup()
+        result['ready_ms'] = (time.perf_counter() - started) * 1000
+        app.root.after(0, app.root.destroy)
+
+    app._finish_startup = measured_finish_startup
+    app.root.after(30000, app.root.destroy)  # In case the window never maps
+    app.run()
+print(json.dumps(result))
+"""
+
+
+def has_display():
+    if sys.platform != "linux":
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def parse_importtime(stderr):
+    """Return (cumulative microseconds, module) for each top-level import"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if module.startswith("  "):
+            continue  # Imported by another module, already counted there
+        imports.append((int(cumulative), module.strip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--import-budget-ms", type=float, default=100,
+                        help="Longest 'import main' may take")
+    parser.add_argument("--frame-budget-ms", type=float, default=1500,
+                        help="Longest until the window is drawn, imports included")
+    parser.add_argument("--no-gui", action="store_true", help="Only check the import budget")
+    parser.add_argument("--top", type=int, default=10, help="How many slow imports to list")
+    args = parser.parse_args()
+
+    gui = has_display() and not args.no_gui
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE % {'gui': gui}],
+        cwd=HERE,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        print(completed.stderr, file=sys.stderr)
+        return 2
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print("Slowest imports (cumulative):")
+    for cumulative, module in sorted(parse_importtime(completed.stderr), reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {module}")
+    print()
+
+    failed = False
+    checks = [('import main', result['import_ms'], args.import_budget_ms)]
+    if gui and 'ready_ms' not in result:
+        # The window never mapped, or building the other steps failed
+        print(completed.stderr, file=sys.stderr)
+        return 2
+    if gui:
+        checks.append(('first frame', result['frame_ms'], args.frame_budget_ms))
+    else:
+        print("No display, skipping the first frame check")
+    for name, took, budget in checks:
+        over = took > budget
+        failed = failed or over
+        print(f"{name}: {took:.1f} ms (budget {budget:.0f} ms){'  OVER BUDGET' if over else ''}")
+    if gui:
+        print(f"all steps built: {result['ready_ms']:.1f} ms")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
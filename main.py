@@ -1,32 +1,2692 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-
-import anthropic
-import customtkinter as ctk
+import argparse
 import json
 import time
 import threading
 import queue
 import os
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC, wait
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import sys
+import base64
+import gzip
+import hashlib
+import random
+import zlib
+import shutil
+import sqlite3
+from array import array
+from collections import deque
 from pathlib import Path
 
-# Set up CustomTkinter appearance
-ctk.set_appearance_mode("light")
-ctk.set_default_color_theme("blue")
+ANALYSIS_URL = os.environ.get(
+    'MESSENGER_ANALYSIS_URL', 'https://messenger-analysis-api-k63dd.ondigitalocean.app/analyze'
+)
+# Gzip request bodies. Off unless the server is known to accept Content-Encoding: gzip
+ANALYSIS_GZIP = os.environ.get('MESSENGER_ANALYSIS_GZIP') == '1'
+ANALYSIS_CHUNK_BYTES = 50000  # Largest piece of transcript sent in one request
+ANALYSIS_PARALLEL = 4  # Requests in flight at once
+ANALYSIS_PROMPT_VERSION = 1  # Bump when the server's prompts change, to retire cached results
+
+
+def load_gui_modules():
+    """Import tkinter and customtkinter, which the command line never needs"""
+    global tk, ttk, messagebox, ctk
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+
+    import customtkinter as ctk
+
+    # Set up CustomTkinter appearance
+    ctk.set_appearance_mode("light")
+    ctk.set_default_color_theme("blue")
+
+
+def load_selenium():
+    """Import Selenium on first use; only exports need a browser"""
+    global webdriver, By, WebDriverWait, EC, ActionChains, Keys
+    global TimeoutException, NoSuchElementException, StaleElementReferenceException, WebDriverException
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.common.keys import Keys
+    from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException, WebDriverException
+
+# Helpers injected into the Messenger page. The definition is guarded so it only
+# runs once per page load; every call site appends its own "return ..." line.
+PAGE_HELPERS_JS = """
+if (!window.__messengerExporter) {
+    window.__messengerExporter = (function () {
+        var nextNodeId = 1;
+        var nodesById = new Map();
+
+        function backgroundColor(element) {
+            var bgColor = window.getComputedStyle(element).backgroundColor;
+            if (bgColor === 'rgba(0, 0, 0, 0)' || !bgColor) {
+                var parent = element.parentElement;
+                while (parent && window.getComputedStyle(parent).backgroundColor === 'rgba(0, 0, 0, 0)') {
+                    parent = parent.parentElement;
+                }
+                return parent ? window.getComputedStyle(parent).backgroundColor : null;
+            }
+            return bgColor;
+        }
+
+        function content(element, links) {
+            var text = '';
+            function processNode(node) {
+                if (node.nodeType === Node.TEXT_NODE) {
+                    text += node.textContent;
+                } else if (node.tagName === 'A') {
+                    text += node.textContent + ' [' + node.href + '] ';
+                    links.push(node.href);
+                } else {
+                    for (var i = 0; i < node.childNodes.length; i++) {
+                        processNode(node.childNodes[i]);
+                    }
+                }
+            }
+            processNode(element);
+            return text;
+        }
+
+        function sender(element, senderXpaths) {
+            for (var i = 0; i < senderXpaths.length; i++) {
+                var found = document.evaluate(
+                    senderXpaths[i], element, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+                ).singleNodeValue;
+                if (found) {
+                    return (found.innerText || '').trim();
+                }
+            }
+            return '';
+        }
+
+        function tagPattern(messageXpath) {
+            return messageXpath.replace(/^\\.\\/\\//, '').split('/').map(function (tag) {
+                return tag.toUpperCase();
+            });
+        }
+
+        // Same test as evaluating messageXpath from the container, for one node
+        function isMessage(node, container, pattern) {
+            var current = node;
+            for (var i = pattern.length - 1; i >= 0; i--) {
+                if (!current || current === container || current.tagName !== pattern[i]) {
+                    return false;
+                }
+                if (i > 0) {
+                    current = current.parentElement;
+                }
+            }
+            return container.contains(current) && current !== container;
+        }
+
+        function nodeId(element) {
+            if (!element.__messengerExporterId) {
+                element.__messengerExporterId = nextNodeId++;
+                nodesById.set(element.__messengerExporterId, new WeakRef(element));
+            }
+            return element.__messengerExporterId;
+        }
+
+        // 64-bit string hash returned as [high, low] 32-bit halves
+        function hash64(str) {
+            var h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+            for (var i = 0; i < str.length; i++) {
+                var ch = str.charCodeAt(i);
+                h1 = Math.imul(h1 ^ ch, 2654435761);
+                h2 = Math.imul(h2 ^ ch, 1597334677);
+            }
+            h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+            h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+            return [h2 >>> 0, h1 >>> 0];
+        }
+
+        // Attributes that do not change when more messages load around a bubble
+        function keyOf(element, senderXpaths) {
+            if (element.__messengerExporterKey !== undefined) {
+                return element.__messengerExporterKey;  // Trimmed, see trim()
+            }
+            return backgroundColor(element) + '|' + sender(element, senderXpaths) + '|' +
+                (element.innerText || '').trim();
+        }
+
+        // A message is identified by its own key, how many identical messages
+        // sit right before it, and the keys of the CONTEXT older messages before
+        // those, counting each run of identical messages once. One neighbour is
+        // not enough: an exchange like "good night" / "night" repeats often.
+        // Only older neighbours are used so new messages arriving at the bottom
+        // never change an existing fingerprint. "edge" means the context reaches
+        // the oldest loaded message, so the fingerprint is not final yet.
+        var CONTEXT = 4;
+
+        function fingerprint(key, run, context) {
+            return hash64(key + '\\u0001' + run + '\\u0001' + context.join('\\u0001'));
+        }
+
+        function startIdentity(key) {
+            return {key: key, last: key, run: 0, context: []};
+        }
+
+        // Adds the next older message's key, returns whether more are needed
+        function widen(found, previousKey) {
+            if (previousKey !== found.last) {
+                found.context.push(previousKey);
+                found.last = previousKey;
+            } else if (!found.context.length) {
+                found.run++;
+            }
+            return found.context.length < CONTEXT;
+        }
+
+        function settle(found) {
+            return {
+                fingerprint: fingerprint(found.key, found.run, found.context),
+                edge: found.context.length < CONTEXT
+            };
+        }
+
+        // Same as identify() for message j of keys, which are in page order
+        function identifyAt(keys, j) {
+            var found = startIdentity(keys[j]);
+            var k = j - 1;
+            while (k >= 0 && widen(found, keys[k])) {
+                k--;
+            }
+            return settle(found);
+        }
+
+        function describe(element, senderXpaths) {
+            var text = (element.innerText || '').trim();
+            var color = backgroundColor(element);
+            var senderName = sender(element, senderXpaths);
+            var links = [];
+            return {
+                node_id: nodeId(element),
+                key: color + '|' + senderName + '|' + text,
+                color: color,
+                content: content(element, links),
+                links: links,
+                text: text,
+                has_image: element.getElementsByTagName('img').length > 0 &&
+                    element.innerHTML.toLowerCase().indexOf('image') !== -1,
+                sender: senderName
+            };
+        }
+
+        function lastMessageIn(root, container, pattern) {
+            var candidates = root.getElementsByTagName(pattern[pattern.length - 1]);
+            for (var i = candidates.length - 1; i >= 0; i--) {
+                if (isMessage(candidates[i], container, pattern)) {
+                    return candidates[i];
+                }
+            }
+            return isMessage(root, container, pattern) ? root : null;
+        }
+
+        // Walk backwards through the tree from a message to the one before it
+        function previousMessage(element, container, pattern) {
+            var current = element;
+            while (current && current !== container) {
+                var sibling = current.previousElementSibling;
+                while (sibling) {
+                    var found = lastMessageIn(sibling, container, pattern);
+                    if (found) {
+                        return found;
+                    }
+                    sibling = sibling.previousElementSibling;
+                }
+                current = current.parentElement;
+            }
+            return null;
+        }
+
+        function identify(element, key, container, pattern, senderXpaths) {
+            var found = startIdentity(key);
+            var previous = previousMessage(element, container, pattern);
+            while (previous && widen(found, keyOf(previous, senderXpaths))) {
+                previous = previousMessage(previous, container, pattern);
+            }
+            return settle(found);
+        }
+
+        function finish(record, identity) {
+            record.fingerprint = identity.fingerprint;
+            record.edge = identity.edge;
+            delete record.key;
+            return record;
+        }
+
+        function extract(container, messageXpath, senderXpaths) {
+            var snapshot = document.evaluate(
+                messageXpath, container, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+            );
+            var records = [];
+            for (var i = 0; i < snapshot.snapshotLength; i++) {
+                var element = snapshot.snapshotItem(i);
+                if (element.__messengerExporterKey !== undefined) {
+                    // Already exported and trimmed, only its key is still needed
+                    records.push({key: element.__messengerExporterKey, trimmed: true});
+                } else {
+                    records.push(describe(element, senderXpaths));
+                }
+            }
+
+            // The snapshot is already in page order, so neighbours come for free
+            var keys = records.map(function (record) {
+                return record.key;
+            });
+            for (var j = 0; j < records.length; j++) {
+                finish(records[j], identifyAt(keys, j));
+            }
+
+            return {
+                records: records.filter(function (record) {
+                    return !record.trimmed;
+                }),
+                first: snapshot.snapshotLength ? snapshot.snapshotItem(0) : null
+            };
+        }
+
+        // Hollows out messages that are safely written so a long export does
+        // not hold the whole history in the page. Each keeps its key, which
+        // newer neighbours' fingerprints need, and its height, so the scroll
+        // position does not move.
+        function trim(ids, senderXpaths) {
+            var elements = [];
+            for (var i = 0; i < ids.length; i++) {
+                var ref = nodesById.get(ids[i]);
+                nodesById.delete(ids[i]);
+                var element = ref && ref.deref();
+                if (element && element.isConnected && element.__messengerExporterKey === undefined) {
+                    elements.push(element);
+                }
+            }
+
+            // Read everything before changing anything so layout runs once
+            var saved = elements.map(function (element) {
+                return {key: keyOf(element, senderXpaths), height: element.offsetHeight};
+            });
+            elements.forEach(function (element, j) {
+                element.__messengerExporterKey = saved[j].key;
+                element.style.height = saved[j].height + 'px';
+                element.textContent = '';
+            });
+            return elements.length;
+        }
+
+        // Nearest scrollable ancestor of the message list
+        function scroller(container, anchor) {
+            var element = anchor || container;
+            while (element && element !== document.body) {
+                var overflowY = window.getComputedStyle(element).overflowY;
+                if ((overflowY === 'auto' || overflowY === 'scroll') && element.scrollHeight > element.clientHeight) {
+                    return element;
+                }
+                element = element.parentElement;
+            }
+            return null;
+        }
+
+        // Scroll towards older messages by a fraction of the visible height.
+        // No clamping: column-reverse lists use negative scrollTop values and
+        // the browser clamps on its own. Returns whether anything moved.
+        function scrollUp(container, anchor, fraction) {
+            var element = scroller(container, anchor);
+            if (!element) {
+                return false;
+            }
+            var before = element.scrollTop;
+            element.scrollTop = before - element.clientHeight * fraction;
+            return element.scrollTop !== before;
+        }
+
+        // Look for a fingerprint among the messages not checked by earlier calls.
+        // History is prepended, so only the first (total - checked) messages need
+        // looking at: older ones that are new, and ones that were at the edge
+        // last time. checked in the result counts, from the bottom, the messages
+        // whose fingerprint was final.
+        function seek(container, messageXpath, senderXpaths, target, checked) {
+            var snapshot = document.evaluate(
+                messageXpath, container, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+            );
+            var total = snapshot.snapshotLength;
+            var end = Math.max(total - checked, 0);
+            var keys = [];
+            for (var i = 0; i < end; i++) {
+                keys.push(keyOf(snapshot.snapshotItem(i), senderXpaths));
+            }
+            var firstFinal = end;
+            for (var j = 0; j < end; j++) {
+                var found = identifyAt(keys, j);
+                if (found.edge) {
+                    continue;
+                }
+                firstFinal = Math.min(firstFinal, j);
+                if (found.fingerprint[0] === target[0] && found.fingerprint[1] === target[1]) {
+                    return {found: true, count: total, checked: total, first: snapshot.snapshotItem(0)};
+                }
+            }
+            return {
+                found: false,
+                count: total,
+                checked: total - firstFinal,
+                first: total ? snapshot.snapshotItem(0) : null
+            };
+        }
+
+        // Calls done('loaded') once a message renders above anchor, 'settled' if
+        // a loading spinner came and went without one, or 'timeout'
+        function waitForHistory(anchor, container, messageXpath, timeoutMs, done) {
+            var pattern = tagPattern(messageXpath);
+            var spinnerSeen = false;
+            var finished = false;
+            var observer = null;
+            var timer = null;
+
+            function finish(outcome) {
+                finished = true;
+                observer.disconnect();
+                clearTimeout(timer);
+                done(outcome);
+            }
+
+            function check() {
+                if (finished) {
+                    return;
+                }
+                if (!anchor || !anchor.isConnected || previousMessage(anchor, container, pattern)) {
+                    finish('loaded');
+                } else if (container.querySelector('[role="progressbar"]')) {
+                    spinnerSeen = true;
+                } else if (spinnerSeen) {
+                    finish('settled');
+                }
+            }
+
+            observer = new MutationObserver(check);
+            observer.observe(container, {childList: true, subtree: true});
+            timer = setTimeout(function () {
+                finish('timeout');
+            }, timeoutMs);
+            check();
+        }
+
+        // Calls done(true) as soon as selector matches something in the page,
+        // or done(false) after timeoutMs
+        function waitForSelector(selector, timeoutMs, done) {
+            var observer = null;
+            var timer = null;
+
+            function finish(found) {
+                observer.disconnect();
+                clearTimeout(timer);
+                done(found);
+            }
+
+            if (document.querySelector(selector)) {
+                done(true);
+                return;
+            }
+            observer = new MutationObserver(function () {
+                if (document.querySelector(selector)) {
+                    finish(true);
+                }
+            });
+            observer.observe(document.documentElement, {childList: true, subtree: true});
+            timer = setTimeout(function () {
+                finish(false);
+            }, timeoutMs);
+        }
+
+        // Counts the messages on screen in the container, for sizing the zoom
+        function measure(container, messageXpath) {
+            var box = container.getBoundingClientRect();
+            var snapshot = document.evaluate(
+                messageXpath, container, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+            );
+            var visible = 0;
+            for (var i = 0; i < snapshot.snapshotLength; i++) {
+                var rect = snapshot.snapshotItem(i).getBoundingClientRect();
+                if (rect.bottom > box.top && rect.top < box.bottom) {
+                    visible++;
+                }
+            }
+            return {
+                visible: visible,
+                width: window.innerWidth,
+                height: window.innerHeight,
+                ratio: window.devicePixelRatio || 1
+            };
+        }
+
+        function identifyElement(element, container, messageXpath, senderXpaths) {
+            var identity = identify(
+                element, keyOf(element, senderXpaths), container, tagPattern(messageXpath), senderXpaths
+            );
+            identity.node_id = nodeId(element);
+            return identity;
+        }
+
+        // Streaming capture: a MutationObserver queues message nodes as they are
+        // rendered so each pass only has to describe what is new.
+        var stream = null;
+
+        function enqueue(node) {
+            if (!stream.queued.has(node)) {
+                stream.queued.add(node);
+                stream.buffer.push(node);
+            }
+        }
+
+        function collect(node) {
+            if (node.nodeType !== Node.ELEMENT_NODE) {
+                return;
+            }
+            if (isMessage(node, stream.container, stream.pattern)) {
+                enqueue(node);
+            }
+            var candidates = node.getElementsByTagName(stream.pattern[stream.pattern.length - 1]);
+            for (var i = 0; i < candidates.length; i++) {
+                if (isMessage(candidates[i], stream.container, stream.pattern)) {
+                    enqueue(candidates[i]);
+                }
+            }
+        }
+
+        function observe(container, messageXpath) {
+            disconnect();
+            stream = {
+                container: container,
+                pattern: tagPattern(messageXpath),
+                buffer: [],
+                edge: [],
+                queued: new WeakSet(),
+                observer: null
+            };
+            stream.observer = new MutationObserver(function (mutations) {
+                for (var i = 0; i < mutations.length; i++) {
+                    var added = mutations[i].addedNodes;
+                    for (var j = 0; j < added.length; j++) {
+                        collect(added[j]);
+                    }
+                }
+            });
+            stream.observer.observe(container, {childList: true, subtree: true});
+
+            // Seed with whatever is already on screen
+            var snapshot = document.evaluate(
+                messageXpath, container, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+            );
+            for (var k = 0; k < snapshot.snapshotLength; k++) {
+                enqueue(snapshot.snapshotItem(k));
+            }
+        }
+
+        function disconnect() {
+            if (stream && stream.observer) {
+                stream.observer.disconnect();
+            }
+            stream = null;
+        }
+
+        function drain(container, messageXpath, senderXpaths, limit) {
+            if (!stream || stream.container !== container || !container.isConnected) {
+                observe(container, messageXpath);
+            }
+
+            // Messages left at the edge last time are looked at again, their
+            // older neighbours may have loaded since
+            var nodes = stream.buffer.concat(stream.edge).filter(function (node) {
+                return node.isConnected && node.__messengerExporterKey === undefined;
+            });
+            nodes.sort(function (a, b) {
+                return a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1;
+            });
+
+            // Newest messages sit at the bottom, hand those over first
+            var batch = nodes.splice(Math.max(nodes.length - limit, 0));
+            stream.buffer = nodes;
+            stream.edge = [];
+            var records = [];
+            for (var i = 0; i < batch.length; i++) {
+                var record = describe(batch[i], senderXpaths);
+                finish(record, identify(batch[i], record.key, container, stream.pattern, senderXpaths));
+                if (record.edge) {
+                    stream.edge.push(batch[i]);
+                } else {
+                    stream.queued.delete(batch[i]);
+                }
+                records.push(record);
+            }
+
+            return {
+                records: records,
+                first: document.evaluate(
+                    messageXpath, container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+                ).singleNodeValue,
+                pending: nodes.length
+            };
+        }
+
+        return {
+            extract: extract,
+            identify: identifyElement,
+            waitForHistory: waitForHistory,
+            waitForSelector: waitForSelector,
+            measure: measure,
+            trim: trim,
+            scrollUp: scrollUp,
+            seek: seek,
+            drain: drain,
+            disconnect: disconnect
+        };
+    })();
+}
+"""
+
+class FingerprintIndex:
+    """Set of 64-bit message fingerprints stored in an open-addressing table
+
+    All slots live in one array('Q'), so memory is 8 bytes per slot however many
+    messages are exported, and lookups never allocate. Zero marks an empty slot.
+    """
+
+    def __init__(self, capacity=1024):
+        size = 1024
+        while size < capacity * 2:
+            size *= 2
+        self._slots = array('Q', bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+
+    @staticmethod
+    def _key(fingerprint):
+        # Zero is reserved for empty slots
+        return (fingerprint & 0xFFFFFFFFFFFFFFFF) or 1
+
+    def _find(self, key):
+        """Return the slot holding key, or the empty slot where it would go"""
+        slots = self._slots
+        mask = self._mask
+        i = key & mask
+        while slots[i] and slots[i] != key:
+            i = (i + 1) & mask
+        return i
+
+    def __contains__(self, fingerprint):
+        key = self._key(fingerprint)
+        return self._slots[self._find(key)] == key
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return (key for key in self._slots if key)
+
+    def add(self, fingerprint):
+        """Add a fingerprint. Returns False if it was already present"""
+        key = self._key(fingerprint)
+        i = self._find(key)
+        if self._slots[i]:
+            return False
+        self._slots[i] = key
+        self._count += 1
+        if self._count * 2 > len(self._slots):
+            self._grow()
+        return True
+
+    def to_bytes(self):
+        """Pack the stored fingerprints into a byte string"""
+        return array('Q', self).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild an index from to_bytes() output"""
+        keys = array('Q')
+        keys.frombytes(data)
+        index = cls(len(keys))
+        for key in keys:
+            index.add(key)
+        return index
+
+    def _grow(self):
+        old_slots = self._slots
+        self._slots = array('Q', bytes(16 * len(old_slots)))
+        self._mask = len(self._slots) - 1
+        for key in old_slots:
+            if key:
+                self._slots[self._find(key)] = key
+
+
+class ScrollScheduler:
+    """Decides how long to wait for older messages after each scroll
+
+    The wait is based on how long recent loads took. Each scroll that loads
+    nothing doubles it, up to max_wait, and after warn_after misses in a row
+    the user is asked to step in.
+    """
+
+    def __init__(self, initial_wait=3.0, min_wait=0.5, max_wait=20.0, warn_after=3, history_size=20):
+        self.initial_wait = initial_wait
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.warn_after = warn_after
+        self.load_times = deque(maxlen=history_size)
+        self.misses = 0
+
+    def timeout(self):
+        """Seconds to wait for the next load"""
+        if self.load_times:
+            ordered = sorted(self.load_times)
+            # Twice the 90th percentile leaves room for the occasional slow load
+            wait = max(self.min_wait, ordered[int(len(ordered) * 0.9)] * 2)
+        else:
+            wait = self.initial_wait
+        return min(self.max_wait, wait * 2 ** self.misses)
+
+    def record_load(self, seconds):
+        self.load_times.append(seconds)
+        self.misses = 0
+
+    def record_miss(self):
+        self.misses += 1
+
+    def reset_backoff(self):
+        self.misses = 0
+
+    def should_warn(self):
+        return self.misses >= self.warn_after
+
+
+class TranscriptSink:
+    """Appends formatted messages to the plain-text transcript"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write_batch(self, entries):
+        self.f.write("".join(entry['formatted'] + "\n" for entry in entries))
+
+    def flush(self):
+        self.f.flush()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.flush()
+
+
+class JsonlSink:
+    """Writes one JSON object per message to a .jsonl file"""
+
+    FIELDS = ('seq', 'fingerprint', 'sender', 'color', 'color_name', 'content', 'links', 'has_image', 'captured_at')
+
+    def __init__(self, path):
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write_batch(self, entries):
+        self.f.write("".join(
+            json.dumps({field: entry[field] for field in self.FIELDS}, ensure_ascii=False) + "\n"
+            for entry in entries
+        ))
+
+    def flush(self):
+        self.f.flush()
+
+    def sync(self):
+        if self.f.closed:
+            return
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+
+class SqliteSink:
+    """Stores messages from every export in one SQLite database
+
+    Rows are keyed on (conversation, fingerprint), so exporting the same chat
+    again updates messages instead of duplicating them. Messages the page
+    could not fingerprint are left out, as they would be added again on
+    every export. messages_fts is an FTS5 index over the content, e.g.
+
+        SELECT m.* FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+        WHERE messages_fts MATCH 'holiday' ORDER BY rank
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY,
+            conversation TEXT NOT NULL,
+            fingerprint TEXT,
+            seq INTEGER,
+            sender TEXT,
+            content TEXT NOT NULL,
+            captured_at TEXT,
+            UNIQUE (conversation, fingerprint)
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+            USING fts5(content, content='messages', content_rowid='id');
+        CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END;
+    """
+
+    def __init__(self, path, conversation):
+        self.conversation = conversation
+        # Created here but only used from the writer thread afterwards
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def write_batch(self, entries):
+        # NULLs never conflict, so these could not be upserted
+        entries = [entry for entry in entries if entry['fingerprint'] is not None]
+        if not entries:
+            return
+        # One transaction per batch
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO messages (conversation, fingerprint, seq, sender, content, captured_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (conversation, fingerprint) DO UPDATE SET
+                    seq = excluded.seq,
+                    sender = excluded.sender,
+                    content = excluded.content,
+                    captured_at = excluded.captured_at
+                """,
+                [
+                    (self.conversation, entry['fingerprint'], entry['seq'], entry['sender'],
+                     entry['content'], entry['captured_at'])
+                    for entry in entries
+                ]
+            )
+
+    def flush(self):
+        pass
+
+    def sync(self):
+        if self.conn is not None:
+            self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        self.conn.close()
+        self.conn = None
+
+    @staticmethod
+    def shift_older(path, conversation, offset, before):
+        """Move earlier messages down by offset after an incremental export"""
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                conn.execute(
+                    "UPDATE messages SET seq = seq + ? WHERE conversation = ? AND captured_at < ?",
+                    (offset, conversation, before)
+                )
+        finally:
+            conn.close()
+
+
+class ExportWriteError(Exception):
+    """A sink failed in the writer thread, so nothing more can be saved"""
+
+
+class ExportWriter:
+    """Background thread that commits exported messages to its sinks in batches
+
+    Entries travel through a bounded queue, so a slow disk holds the export back
+    instead of filling memory. With durability "batch" the sinks are flushed once
+    per batch_size entries or batch_interval seconds, with "message" after every
+    entry. fsync only happens in sync(), which checkpoints call.
+    """
+
+    def __init__(self, sinks, batch_size=100, batch_interval=0.5, durability="batch", max_queue=2000):
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.durability = durability
+        self.error = None
+        self.written = 0  # Entries queued so far
+        self.committed = 0  # Entries handed to every sink and flushed
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._closed = False
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, entry):
+        """Queue an entry, blocking while the queue is full"""
+        self._check()
+        self.written += 1
+        self._queue.put(('write', entry))
+
+    def sync(self):
+        """Block until everything queued so far is written and fsynced"""
+        if self._closed:
+            self._check()
+            for sink in self.sinks:
+                sink.sync()
+            return
+        done = threading.Event()
+        self._queue.put(('sync', done))
+        done.wait()
+        self._check()
+
+    def close(self):
+        """Write whatever is still queued and stop the thread
+
+        Raises:
+            ExportWriteError: If anything queued could not be written
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(('close', None))
+        self._thread.join()
+        self._check()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _check(self):
+        if self.error:
+            raise ExportWriteError(f"Could not save messages: {self.error}") from self.error
+
+    def _commit(self, entries):
+        if not entries:
+            return
+        for sink in self.sinks:
+            sink.write_batch(entries)
+            sink.flush()
+        self.committed += len(entries)
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = max(0, deadline - time.monotonic()) if pending else None
+            try:
+                kind, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, payload = 'flush', None
+
+            try:
+                if kind == 'write':
+                    if not pending:
+                        deadline = time.monotonic() + self.batch_interval
+                    pending.append(payload)
+                    if self.durability == "message" or len(pending) >= self.batch_size:
+                        self._commit(pending)
+                        pending = []
+                    continue
+
+                self._commit(pending)
+                pending = []
+                if kind == 'sync':
+                    for sink in self.sinks:
+                        sink.sync()
+                elif kind == 'close':
+                    for sink in self.sinks:
+                        sink.close()
+            except Exception as e:
+                # Keep draining so the export thread never blocks on a dead writer
+                self.error = e
+                pending = []
+            finally:
+                if kind == 'sync':
+                    payload.set()
+
+            if kind == 'close':
+                return
+
+
+def rgb_to_color_name(rgb_string):
+    """Convert RGB color to descriptive name with support for 20+ distinct colors
+
+    Args:
+        rgb_string (str): RGB color in format 'rgb(r,g,b)' or 'rgba(r,g,b,a)'
+
+    Returns:
+        str: Detailed color name description
+    """
+    try:
+        # Parse RGB values
+        rgb_values = rgb_string.strip('rgba()').split(',')
+        r = int(rgb_values[0])
+        g = int(rgb_values[1])
+        b = int(rgb_values[2])
+
+        # Check for grayscale first
+        if max(abs(r - g), abs(r - b), abs(g - b)) < 20:
+            if r < 30:
+                return "Black"
+            elif r > 225:
+                return "White"
+            elif r > 160:
+                return "Light Gray"
+            elif r > 90:
+                return "Gray"
+            else:
+                return "Dark Gray"
+
+        # Calculate color dominance
+        max_val = max(r, g, b)
+        min_val = min(r, g, b)
+        delta = max_val - min_val
+
+        # Calculate hue
+        if delta == 0:
+            hue = 0
+        elif max_val == r:
+            hue = 60 * (((g - b) / delta) % 6)
+        elif max_val == g:
+            hue = 60 * (((b - r) / delta) + 2)
+        else:
+            hue = 60 * (((r - g) / delta) + 4)
+
+        # Calculate saturation
+        saturation = 0 if max_val == 0 else (delta / max_val) * 100
+
+        # Calculate value/brightness
+        value = (max_val / 255) * 100
+
+        # Early returns for special cases
+        if saturation < 10:
+            return "Gray"
+        if value < 15:
+            return "Black"
+        elif value > 95 and saturation < 20:
+            return "White"
+
+        # Detailed color determination based on hue ranges
+        if 0 <= hue <= 10 or hue >= 350:
+            if value > 80:
+                return "Pink" if saturation < 50 else "Red"
+            elif value > 50:
+                return "Dark Red"
+            else:
+                return "Maroon"
+
+        elif 10 < hue <= 20:
+            if value > 80:
+                return "Salmon"
+            else:
+                return "Dark Salmon"
+
+        elif 20 < hue <= 40:
+            if value > 80:
+                return "Orange"
+            elif value > 50:
+                return "Dark Orange"
+            else:
+                return "Brown"
+
+        elif 40 < hue <= 70:
+            if value > 80:
+                return "Yellow"
+            elif value > 50:
+                return "Gold"
+            else:
+                return "Olive"
+
+        elif 70 < hue <= 100:
+            if value > 80:
+                return "Lime"
+            elif value > 50:
+                return "Green"
+            else:
+                return "Dark Green"
+
+        elif 100 < hue <= 140:
+            if value > 80:
+                return "Light Green"
+            elif value > 50:
+                return "Sea Green"
+            else:
+                return "Forest Green"
+
+        elif 140 < hue <= 170:
+            if value > 80:
+                return "Aqua"
+            elif value > 50:
+                return "Teal"
+            else:
+                return "Dark Teal"
+
+        elif 170 < hue <= 200:
+            if value > 80:
+                return "Light Blue"
+            elif value > 50:
+                return "Sky Blue"
+            else:
+                return "Steel Blue"
+
+        elif 200 < hue <= 240:
+            if value > 80:
+                return "Azure"
+            elif value > 50:
+                return "Blue"
+            else:
+                return "Navy"
+
+        elif 240 < hue <= 280:
+            if value > 80:
+                return "Violet"
+            elif value > 50:
+                return "Purple"
+            else:
+                return "Dark Purple"
+
+        elif 280 < hue <= 320:
+            if value > 80:
+                return "Magenta"
+            elif value > 50:
+                return "Hot Pink"
+            else:
+                return "Deep Pink"
+
+        elif 320 < hue < 350:
+            if value > 80:
+                return "Light Pink"
+            elif value > 50:
+                return "Rose"
+            else:
+                return "Dark Rose"
+
+        return "Unknown"
+
+    except Exception as e:
+        return "Unknown"
+
+
+class ChatExportJob:
+    """Exports the conversation open in a logged-in WebDriver session
+
+    Status updates are put on events as the same dicts the GUI queue uses.
+    Clearing running stops the export. With interactive=False nobody is there
+    to scroll by hand, so the export finishes once history stops loading.
+    """
+
+    CHECKPOINT_VERSION = 3  # Bump when fingerprints or the checkpoint layout change
+
+    def __init__(self, driver, output_file, events, running, chat_type="individual",
+                 extraction_mode="batch", scroll_mode="container", export_mode="full",
+                 durability="batch", write_jsonl=True, write_database=False, block_media=False,
+                 target_per_pass=0, trim_dom=False, interactive=True):
+        self.driver = driver
+        self.output_file = output_file
+        self.events = events
+        self.running = running
+        self.chat_type = chat_type
+        self.extraction_mode = extraction_mode
+        self.scroll_mode = scroll_mode
+        self.export_mode = export_mode
+        self.durability = durability
+        self.write_jsonl = write_jsonl
+        self.write_database = write_database
+        self.block_media = block_media
+        self.target_per_pass = target_per_pass  # 0 leaves the zoom alone
+        self.trim_dom = trim_dom
+        self.interactive = interactive
+        self.processed_messages = FingerprintIndex()
+        self.finished = False  # History stopped loading in a non-interactive export
+
+    def run(self):
+        """Export until the chat is done or running is cleared
+
+        Returns:
+            bool: True if the export finished by itself, having caught up with
+                the previous export or run out of history
+        """
+        if self.block_media:
+            block_resources(self.driver)
+        try:
+            messages_container = None
+            scroll_scheduler = ScrollScheduler()
+
+            # Wait for messages container with timeout and stop check
+            start_time = time.time()
+            while time.time() - start_time < 30 and self.running.is_set():
+                try:
+                    messages_container = self.driver.find_element(
+                        By.CSS_SELECTOR,
+                        "div.x78zum5.xdt5ytf.x1iyjqo2"
+                    )
+                    if messages_container:
+                        break
+                except:
+                    time.sleep(0.5)
+
+            if not messages_container or not self.running.is_set():
+                return False
+
+            output_file = self.output_file
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            conversation_url = self.driver.current_url
+
+            export_mode = self.export_mode
+            started_at = datetime.now()
+            session_start = f"=== Export Session Started: {started_at.strftime('%Y-%m-%d %H:%M:%S')} ===\n"
+
+            checkpoint = None
+            if export_mode != "full":
+                checkpoint = self._load_checkpoint(output_file, conversation_url)
+                if checkpoint is None:
+                    self.events.put({
+                        'type': 'status',
+                        'message': 'No earlier export of this conversation found, starting a new export.',
+                        'level': 'info'
+                    })
+                    export_mode = "full"
+
+            # Incremental exports collect new messages on the side and put them
+            # in front of the previous transcript once they are all in
+            transcript_file = output_file
+            structured_file = None
+            if self.write_jsonl:
+                structured_file = os.path.splitext(output_file)[0] + ".jsonl"
+            structured_target = structured_file
+            previous_messages = None
+            if export_mode == "incremental":
+                transcript_file = output_file + ".new"
+                previous_messages = checkpoint['index']
+                self.processed_messages = FingerprintIndex()
+                open(transcript_file, "w", encoding="utf-8").close()
+                if structured_file:
+                    structured_target = structured_file + ".new"
+                    open(structured_target, "w", encoding="utf-8").close()
+                self.events.put({
+                    'type': 'status',
+                    'message': session_start.strip(),
+                    'level': 'info'
+                })
+
+            if export_mode == "resume":
+                # Messages written after the checkpoint are not in its index and
+                # will be exported again, so drop them from the files first
+                self._truncate(output_file, checkpoint['transcript_size'])
+                if structured_file:
+                    self._truncate(structured_file, checkpoint['jsonl_size'])
+
+            if export_mode == "full":
+                self.processed_messages = FingerprintIndex()
+                if structured_file:
+                    open(structured_file, "w", encoding="utf-8").close()
+
+                # Open file in write mode first to clear it, then reopen in append mode
+                with open(output_file, "w", encoding="utf-8") as f:
+                    # Write initial session marker
+                    f.write(session_start)
+                    f.flush()
+                    self.events.put({
+                        'type': 'status',
+                        'message': session_start.strip(),
+                        'level': 'info'
+                    })
+
+            caught_up = False  # Incremental export reached the previous one
+
+            # Reopen in append mode for the rest of the export
+            sinks = []
+            if structured_target:
+                sinks.append(JsonlSink(structured_target))
+            database_file = None
+            if self.write_database:
+                database_file = os.path.join(os.path.dirname(output_file), "messenger.db")
+                sinks.append(SqliteSink(database_file, conversation_url))
+
+            with open(transcript_file, "a", encoding="utf-8") as f, ExportWriter(
+                [TranscriptSink(f)] + sinks,
+                durability=self.durability
+            ) as writer:
+                message_count = 0
+                anchor = None  # Fingerprint of the oldest message reached
+                last_checkpoint = time.monotonic()
+                message_xpath = ".//div/div/div/div/div/div/div/div/div/div/div/div/div/div/div/div/div/span/div/div/div/span/div"
+                sender_xpath = "./ancestor::div[contains(@class, 'x1n2onr6')]/div[1]/div/div/h4/div/div/span/span/span"
+                reply_sender_xpath = "./ancestor::div[contains(@class, 'x1n2onr6')]/div[1]/div/div[1]/div/div/h4/div/div/div/div[2]/span/span"
+                deferred = {}  # node id -> record at the top edge of the loaded history
+                trim_queue = deque()  # (entries written by the end of a pass, its node ids)
+
+                if self.target_per_pass:
+                    self._fit_zoom(messages_container, message_xpath)
+
+                sender_xpaths = []
+                if self.chat_type == "group":
+                    sender_xpaths = [sender_xpath, reply_sender_xpath]
+
+                if export_mode == "resume":
+                    self.processed_messages = checkpoint['index']
+                    message_count = checkpoint['message_count']
+                    anchor = checkpoint['anchor']
+                    session_resumed = f"\n=== Export Session Resumed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n"
+                    f.write(session_resumed)
+                    f.flush()
+                    self.events.put({
+                        'type': 'status',
+                        'message': f"{session_resumed.strip()} ({message_count} messages already saved)",
+                        'level': 'info'
+                    })
+
+                    if anchor is not None and not self._seek_checkpoint_anchor(
+                        messages_container, message_xpath, sender_xpaths, anchor, scroll_scheduler
+                    ):
+                        self.events.put({
+                            'type': 'status',
+                            'message': 'Could not find where the last export stopped, continuing from here.',
+                            'level': 'warning'
+                        })
+                elif export_mode == "incremental":
+                    self.events.put({
+                        'type': 'status',
+                        'message': f"Looking for messages newer than the last export ({checkpoint['message_count']} messages)...",
+                        'level': 'info'
+                    })
+
+                while self.running.is_set() and not self.finished:
+                    try:
+                        if self.extraction_mode == "batch":
+                            visible_records, first_message = self._extract_visible_messages(
+                                messages_container, message_xpath, sender_xpaths
+                            )
+                            total_visible = len(visible_records)
+                            records = reversed(visible_records)
+                        elif self.extraction_mode == "stream":
+                            # Anything still buffered in the page counts as unprocessed,
+                            # so we only scroll once the buffer has been emptied
+                            new_records, first_message, pending = self._drain_new_messages(
+                                messages_container, message_xpath, sender_xpaths
+                            )
+                            total_visible = len(new_records) + pending
+                            records = reversed(new_records)
+                        else:
+                            visible_messages = messages_container.find_elements(By.XPATH, message_xpath)
+                            total_visible = len(visible_messages)
+                            first_message = visible_messages[0] if visible_messages else None
+                            records = self._read_message_elements(
+                                visible_messages, messages_container, message_xpath, sender_xpaths
+                            )
+
+                        if first_message is None:
+                            time.sleep(1)
+                            continue
+
+                        processed_in_view = 0
+                        pass_ids = []
+
+                        for record in records:
+                            if not self.running.is_set():
+                                break
+
+                            if record['edge']:
+                                # Its older neighbour has not loaded yet, so the
+                                # fingerprint may still change. Keep it for later.
+                                deferred[record['node_id']] = record
+                                processed_in_view += 1
+                                continue
+                            deferred.pop(record['node_id'], None)
+                            pass_ids.append(record['node_id'])
+
+                            message_id = None
+                            if record['fingerprint']:
+                                message_id = self._fingerprint(record)
+
+                            if (previous_messages is not None and message_id is not None
+                                    and message_id in previous_messages):
+                                # Everything from here back is already in the last export
+                                caught_up = True
+                                break
+
+                            if message_id is not None and message_id in self.processed_messages:
+                                processed_in_view += 1
+                                continue
+
+                            # New messages arrived, so loading is working again
+                            scroll_scheduler.reset_backoff()
+
+                            # Skip pure image messages
+                            if record['has_image'] and not record['text']:
+                                if message_id is not None:
+                                    self.processed_messages.add(message_id)
+                                    anchor = message_id
+                                processed_in_view += 1
+                                continue
+
+                            if self._write_record(writer, record, message_count + 1):
+                                message_count += 1
+                                if message_id is not None:
+                                    self.processed_messages.add(message_id)
+                                    anchor = message_id
+
+                                # Update progress every 10 messages
+                                if message_count % 10 == 0:
+                                    progress_msg = f"Processed {message_count} messages... (write queue: {writer.depth()})"
+                                    self.events.put({
+                                        'type': 'status',
+                                        'message': progress_msg,
+                                        'level': 'info',
+                                        'coalesce': 'progress'
+                                    })
+
+                            processed_in_view += 1
+
+                        if caught_up:
+                            break
+
+                        if self.trim_dom:
+                            trim_queue.append((writer.written, pass_ids))
+                            self._trim_exported(trim_queue, writer, sender_xpaths)
+
+                        # Incremental exports only checkpoint once merged
+                        if export_mode != "incremental" and time.monotonic() - last_checkpoint >= 30:
+                            self._save_checkpoint(writer, output_file, conversation_url, message_count, anchor)
+                            last_checkpoint = time.monotonic()
+
+                        # Scroll handling
+                        if processed_in_view >= total_visible and self.running.is_set():
+                            # Update GUI about scrolling
+                            self.events.put({
+                                'type': 'status',
+                                'message': f'Scrolling to load more messages ({processed_in_view} in this pass)...',
+                                'level': 'info',
+                                'coalesce': 'scroll'
+                            })
+                            self._scroll_up(messages_container, first_message)
+                            self._wait_for_older_messages(
+                                scroll_scheduler, messages_container, first_message, message_xpath
+                            )
+
+                    except ExportWriteError:
+                        raise  # Retrying cannot help, end the export
+                    except Exception as e:
+                        self.events.put({
+                            'type': 'status',
+                            'message': f'Error in main loop: {str(e)}',
+                            'level': 'warning'
+                        })
+                        time.sleep(1)
+                        continue
+
+                # The oldest loaded messages never got a settled fingerprint;
+                # write them with the one they have rather than lose them.
+                # After catching up they are all older than the overlap.
+                if not caught_up:
+                    for record in deferred.values():
+                        message_id = self._fingerprint(record)
+                        if message_id in self.processed_messages:
+                            continue
+                        if previous_messages is not None and message_id in previous_messages:
+                            continue
+                        self.processed_messages.add(message_id)
+                        if record['has_image'] and not record['text']:
+                            continue
+                        if self._write_record(writer, record, message_count + 1):
+                            message_count += 1
+
+                if self.extraction_mode == "stream":
+                    try:
+                        self.driver.execute_script(
+                            "if (window.__messengerExporter) { window.__messengerExporter.disconnect(); }"
+                        )
+                    except:
+                        pass
+
+                # Everything queued goes out before the end marker
+                writer.close()
+
+                # Write session end marker
+                session_end = f"\n=== Export Session Ended: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n"
+                f.write(session_end)
+                f.flush()
+                self.events.put({
+                    'type': 'status',
+                    'message': session_end.strip(),
+                    'level': 'info'
+                })
+
+                if export_mode != "incremental":
+                    self._save_checkpoint(writer, output_file, conversation_url, message_count, anchor)
+
+                    # Final summary
+                    summary_msg = f"Export completed! Saved {message_count} messages to {output_file}"
+                    self.events.put({
+                        'type': 'status',
+                        'message': summary_msg,
+                        'level': 'info'
+                    })
+
+            if export_mode == "incremental" and not caught_up:
+                # Merging would make this run the new baseline, and the next one
+                # would stop at its newest message and never fill the gap. The
+                # messages stay in the side files and are fetched again next time.
+                self.events.put({
+                    'type': 'status',
+                    'message': (f"Export stopped before reaching the last export. {output_file} was left "
+                                f"unchanged; the {message_count} new messages found are in {transcript_file} "
+                                f"and will be exported again next time"),
+                    'level': 'warning'
+                })
+            elif export_mode == "incremental":
+                self._merge_incremental_export(output_file, transcript_file, session_start)
+                if structured_file:
+                    self._merge_incremental_jsonl(structured_file, structured_target)
+                if database_file:
+                    SqliteSink.shift_older(
+                        database_file, conversation_url, message_count,
+                        started_at.isoformat(timespec='seconds')
+                    )
+                for fingerprint in previous_messages:
+                    self.processed_messages.add(fingerprint)
+                self._save_checkpoint(
+                    None, output_file, conversation_url,
+                    checkpoint['message_count'] + message_count, checkpoint['anchor']
+                )
+
+                summary_msg = f"Export completed! Added {message_count} new messages to {output_file}"
+                self.events.put({
+                    'type': 'status',
+                    'message': summary_msg,
+                    'level': 'info'
+                })
+
+            self.message_count = message_count
+            # An incremental export is only done once it meets the last one
+            if caught_up or (self.finished and export_mode != "incremental"):
+                self.events.put({'type': 'complete'})
+                return True
+
+        except Exception as e:
+            self.events.put({
+                'type': 'status',
+                'message': f'Critical export error: {str(e)}',
+                'level': 'error'
+            })
+        finally:
+            # The browser stays open for later use, so undo page changes
+            if self.block_media:
+                try:
+                    block_resources(self.driver, False)
+                except:
+                    pass
+            if self.target_per_pass:
+                try:
+                    self.driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+                except:
+                    pass
+        return False
+
+    def get_message_identifier(self, message_element, messages_container, message_xpath, sender_xpaths):
+        """Identify a message from its content and the messages loaded before it
+
+        Returns:
+            dict: {'fingerprint': [high, low], 'edge': bool, 'node_id': int}, or None
+        """
+        try:
+            return self.driver.execute_script(
+                PAGE_HELPERS_JS + "return window.__messengerExporter.identify(arguments[0], arguments[1], arguments[2], arguments[3]);",
+                message_element,
+                messages_container,
+                message_xpath,
+                sender_xpaths
+            )
+        except Exception as e:
+            print(f"Debug: Error creating message identifier: {e}", file=sys.stderr)
+            return None
+
+    def _get_message_color(self, element):
+        try:
+            color = self.driver.execute_script("""
+                var element = arguments[0];
+                var bgColor = window.getComputedStyle(element).backgroundColor;
+                if (bgColor === 'rgba(0, 0, 0, 0)' || !bgColor) {
+                    var parent = element.parentElement;
+                    while (parent && window.getComputedStyle(parent).backgroundColor === 'rgba(0, 0, 0, 0)') {
+                        parent = parent.parentElement;
+                    }
+                    return parent ? window.getComputedStyle(parent).backgroundColor : null;
+                }
+                return bgColor;
+            """, element)
+            return color
+        except Exception as e:
+            print(f"Debug: Error getting color: {e}", file=sys.stderr)
+            return None
+
+    def _extract_visible_messages(self, messages_container, message_xpath, sender_xpaths):
+        """Read every rendered message in a single execute_script call
+
+        Returns:
+            tuple: (records in page order, first message element or None)
+        """
+        result = self.driver.execute_script(
+            PAGE_HELPERS_JS + "return window.__messengerExporter.extract(arguments[0], arguments[1], arguments[2]);",
+            messages_container,
+            message_xpath,
+            sender_xpaths
+        )
+        return result['records'], result['first']
+
+    def _drain_new_messages(self, messages_container, message_xpath, sender_xpaths, limit=200):
+        """Take newly rendered messages from the in-page MutationObserver buffer
+
+        The observer is installed on the first call (and again if the container
+        is replaced), seeded with the messages already on screen.
+
+        Returns:
+            tuple: (records in page order, first message element or None,
+                    number of messages still buffered)
+        """
+        result = self.driver.execute_script(
+            PAGE_HELPERS_JS + "return window.__messengerExporter.drain(arguments[0], arguments[1], arguments[2], arguments[3]);",
+            messages_container,
+            message_xpath,
+            sender_xpaths,
+            limit
+        )
+        return result['records'], result['first'], result['pending']
+
+    def _read_message_elements(self, visible_messages, messages_container, message_xpath, sender_xpaths):
+        """Yield message records one element at a time, newest first
+
+        This is the original per-message path: every bubble is read with its own
+        WebDriver calls, and hovered first unless the container is scrolled directly.
+        """
+        for message in visible_messages[::-1]:
+            if not self.running.is_set():
+                return
+
+            identity = self.get_message_identifier(message, messages_container, message_xpath, sender_xpaths)
+            if identity is None:
+                identity = {'fingerprint': None, 'edge': False, 'node_id': None}
+            elif not identity['edge'] and self._fingerprint(identity) in self.processed_messages:
+                yield identity
+                continue
+
+            # With container scrolling everything rendered can be read where it is
+            if self.scroll_mode != "container":
+                try:
+                    # Center current message
+                    actions = ActionChains(self.driver)
+                    actions.move_to_element(message).perform()
+                except:
+                    try:
+                        self.driver.execute_script(
+                            "arguments[0].scrollIntoView({block: 'center'});",
+                            message
+                        )
+                    except:
+                        continue
+
+            try:
+                text = message.text
+                has_image = bool(message.find_elements(By.TAG_NAME, "img")) and \
+                    "image" in message.get_attribute("innerHTML").lower()
+                if has_image and not text:
+                    yield dict(identity, has_image=True, text='')
+                    continue
+
+                sender_name = ""
+                for xpath in sender_xpaths:
+                    try:
+                        sender_name = message.find_element(By.XPATH, xpath).text.strip()
+                        break
+                    except:
+                        continue
+
+                color = self._get_message_color(message)
+                extracted = self.driver.execute_script("""
+                    var links = [];
+                    function extractContent(element) {
+                        var text = '';
+                        function processNode(node) {
+                            if (node.nodeType === Node.TEXT_NODE) {
+                                text += node.textContent;
+                            } else if (node.tagName === 'A') {
+                                text += node.textContent + ' [' + node.href + '] ';
+                                links.push(node.href);
+                            } else {
+                                for (var i = 0; i < node.childNodes.length; i++) {
+                                    processNode(node.childNodes[i]);
+                                }
+                            }
+                        }
+                        processNode(element);
+                        return text;
+                    }
+                    return {content: extractContent(arguments[0]), links: links};
+                """, message)
+            except Exception as e:
+                self.events.put({
+                    'type': 'status',
+                    'message': f'Error processing message: {str(e)}',
+                    'level': 'warning'
+                })
+                continue
+
+            yield dict(
+                identity,
+                color=color,
+                content=extracted['content'],
+                links=extracted['links'],
+                text=text,
+                has_image=has_image,
+                sender=sender_name
+            )
+
+    def _write_record(self, writer, record, seq):
+        """Queue a message record for writing and echo it to the status log
+
+        Args:
+            seq (int): Position of the message in this export, 1 being the newest
+
+        Returns:
+            str: The formatted message, or None if the record had no content
+        """
+        content = record['content'].strip()
+        if not content:
+            return None
+
+        formatted_message = self._format_message(record['color'], record['sender'], content)
+        fingerprint = self._fingerprint(record) if record['fingerprint'] else None
+        writer.write({
+            'seq': seq,
+            'fingerprint': f"{fingerprint:016x}" if fingerprint is not None else None,
+            'sender': self._resolve_sender(record['color'], record['sender']) or None,
+            'color': record['color'],
+            'color_name': rgb_to_color_name(record['color']),
+            'content': content,
+            'links': record.get('links', []),
+            'has_image': bool(record['has_image']),
+            'captured_at': datetime.now().isoformat(timespec='seconds'),
+            'formatted': formatted_message
+        })
+
+        # Update GUI with the message
+        self.events.put({
+            'type': 'status',
+            'message': formatted_message,
+            'level': 'info',
+            'echo': True
+        })
+        return formatted_message
+
+    @staticmethod
+    def _fingerprint(record):
+        """Combine the [high, low] halves sent back by the page into one integer"""
+        high, low = record['fingerprint']
+        return high << 32 | low
+
+    def _resolve_sender(self, color, sender_name):
+        """Work out the author label used in exports
+
+        One-to-one chats are labelled by bubble colour ('You', 'Them', or the
+        colour name), group chats by the sender name shown above the bubble.
+        """
+        color_name = rgb_to_color_name(color)
+        if self.chat_type != "group":
+            if color_name == 'Azure':
+                return 'You'
+            if color_name == 'White':
+                return 'Them'
+            return color_name
+
+        if color_name == 'Azure':
+            return 'You'
+        return sender_name
+
+    def _format_message(self, color, sender_name, content):
+        """Format a message as a transcript entry"""
+        sender_name = self._resolve_sender(color, sender_name)
+        if self.chat_type != "group":
+            return f"[{sender_name}] {content}"
+
+        if sender_name != "":
+            return f"{content}\n[{sender_name}]"
+        return content
+
+    def _scroll_container(self, messages_container, anchor, fraction=0.9):
+        """Scroll the message list up by most of a screen without touching the mouse
+
+        Returns:
+            bool: False if no scrollable element was found or it did not move
+        """
+        try:
+            return self.driver.execute_script(
+                PAGE_HELPERS_JS + "return window.__messengerExporter.scrollUp(arguments[0], arguments[1], arguments[2]);",
+                messages_container,
+                anchor,
+                fraction
+            )
+        except Exception as e:
+            print(f"Debug: Error scrolling container: {e}", file=sys.stderr)
+            return False
+
+    def _scroll_up(self, messages_container, first_message, fraction=0.9):
+        """Scroll towards older messages using the selected scroll mode"""
+        scrolled = False
+        if self.scroll_mode == "container":
+            scrolled = self._scroll_container(messages_container, first_message, fraction)
+
+        # Hover and Page Up when the container could not be moved directly
+        if not scrolled:
+            try:
+                actions = ActionChains(self.driver)
+                actions.move_to_element(first_message).perform()
+                actions.send_keys(Keys.PAGE_UP).perform()
+            except:
+                try:
+                    self.driver.execute_script("window.scrollBy(0, -1000);")
+                except:
+                    pass
+
+    def _trim_exported(self, trim_queue, writer, sender_xpaths):
+        """Hollow out message nodes from earlier passes once their batch is on disk"""
+        ids = []
+        # The newest pass holds the scroll anchor, so it always stays
+        while len(trim_queue) > 1 and trim_queue[0][0] <= writer.committed:
+            ids.extend(trim_queue.popleft()[1])
+        if not ids:
+            return
+        try:
+            self.driver.execute_script(
+                PAGE_HELPERS_JS + "return window.__messengerExporter.trim(arguments[0], arguments[1]);",
+                ids,
+                sender_xpaths
+            )
+        except Exception as e:
+            print(f"Debug: Error trimming exported messages: {e}", file=sys.stderr)
+
+    def _measure_view(self, messages_container, message_xpath):
+        return self.driver.execute_script(
+            PAGE_HELPERS_JS + "return window.__messengerExporter.measure(arguments[0], arguments[1]);",
+            messages_container,
+            message_xpath
+        )
+
+    def _fit_zoom(self, messages_container, message_xpath):
+        """Zoom the page out until about target_per_pass messages fit on screen
+
+        Works like the browser's own zoom: the page gets a bigger viewport in
+        CSS pixels, drawn scaled down into the same window.
+
+        Returns:
+            int: Messages on screen afterwards, or None if zoom is unsupported
+        """
+        try:
+            self.driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+            base = view = self._measure_view(messages_container, message_xpath)
+            zoom = 1.0
+            # Message heights vary, so correct once after the first guess
+            for _ in range(2):
+                if not view['visible']:
+                    break
+                new_zoom = max(MIN_ZOOM, min(1.0, zoom * view['visible'] / self.target_per_pass))
+                if abs(new_zoom - zoom) < 0.02:
+                    break
+                zoom = new_zoom
+                self.driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+                    'width': int(base['width'] / zoom),
+                    'height': int(base['height'] / zoom),
+                    'deviceScaleFactor': base['ratio'] * zoom,
+                    'mobile': False,
+                    'scale': zoom
+                })
+                time.sleep(0.5)  # Let the chat render into the larger viewport
+                view = self._measure_view(messages_container, message_xpath)
+        except Exception as e:
+            print(f"Debug: Could not set zoom: {e}", file=sys.stderr)
+            return None
+
+        self.events.put({
+            'type': 'status',
+            'message': f"Zoom set to {zoom:.0%}: {view['visible']} messages per pass "
+                       f"(target {self.target_per_pass})",
+            'level': 'info'
+        })
+        return view['visible']
+
+    def _wait_for_history(self, messages_container, anchor, message_xpath, timeout):
+        """Wait until older messages render above anchor, or timeout seconds pass
+
+        The wait runs in the page and is split into short slices so a stop
+        request is noticed quickly.
+
+        Returns:
+            str: 'loaded', 'settled' (a spinner came and went with nothing new) or 'timeout'
+        """
+        deadline = time.monotonic() + timeout
+        outcome = 'timeout'
+        while self.running.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wait_slice = min(remaining, 2.0)
+            self.driver.set_script_timeout(wait_slice + 5)
+            outcome = self.driver.execute_async_script(
+                PAGE_HELPERS_JS + "window.__messengerExporter.waitForHistory(arguments[0], arguments[1], arguments[2], arguments[3], arguments[arguments.length - 1]);",
+                anchor,
+                messages_container,
+                message_xpath,
+                int(wait_slice * 1000)
+            )
+            if outcome != 'timeout':
+                break
+        return outcome
+
+    def _wait_for_older_messages(self, scheduler, messages_container, anchor, message_xpath, warn=True):
+        """Wait for a scroll to load history, backing off when nothing arrives
+
+        Returns:
+            bool: True if older messages loaded
+        """
+        timeout = scheduler.timeout()
+        started = time.monotonic()
+        try:
+            outcome = self._wait_for_history(messages_container, anchor, message_xpath, timeout)
+        except Exception as e:
+            print(f"Debug: Error waiting for messages to load: {e}", file=sys.stderr)
+            time.sleep(2)
+            outcome = 'timeout'
+
+        if outcome == 'loaded':
+            scheduler.record_load(time.monotonic() - started)
+            return True
+
+        scheduler.record_miss()
+        if not warn:
+            return False
+        if scheduler.should_warn():
+            if self.interactive:
+                self.events.put({'type': 'scroll_warning'})
+                scheduler.reset_backoff()
+            else:
+                # Nobody to scroll by hand, so treat this as the start of the chat
+                self.finished = True
+        elif self.running.is_set():
+            self.events.put({
+                'type': 'status',
+                'message': f'No new messages yet, waiting up to {scheduler.timeout():.1f}s next time...',
+                'level': 'info',
+                'coalesce': 'scroll'
+            })
+        return False
+
+    def _checkpoint_path(self, output_file):
+        return output_file + ".checkpoint"
+
+    def _load_checkpoint(self, output_file, url):
+        """Load the checkpoint left by an earlier export of this conversation
+
+        Returns:
+            dict: Checkpoint data with the fingerprint index under 'index', or None
+                if there is no usable checkpoint
+        """
+        try:
+            with open(self._checkpoint_path(output_file), "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if checkpoint.get('version') != self.CHECKPOINT_VERSION or checkpoint.get('url') != url:
+            return None
+        if checkpoint.get('chat_type') != self.chat_type or not os.path.exists(output_file):
+            return None
+
+        checkpoint['index'] = FingerprintIndex.from_bytes(base64.b64decode(checkpoint['fingerprints']))
+        return checkpoint
+
+    def _save_checkpoint(self, writer, output_file, url, message_count, anchor):
+        """Write a checkpoint once everything queued on writer is on disk
+
+        The checkpoint is written to a temporary file and renamed into place, so
+        a crash leaves either the old or the new one, never half of each. It
+        records how long the transcript and JSONL files are at this point, so a
+        resume can cut off what was appended after it.
+        """
+        if writer is not None:
+            writer.sync()
+
+        structured_file = os.path.splitext(output_file)[0] + ".jsonl"
+        checkpoint = {
+            'version': self.CHECKPOINT_VERSION,
+            'url': url,
+            'chat_type': self.chat_type,
+            'message_count': message_count,
+            'anchor': anchor,
+            'transcript_size': os.path.getsize(output_file),
+            'jsonl_size': os.path.getsize(structured_file) if os.path.exists(structured_file) else None,
+            'fingerprints': base64.b64encode(self.processed_messages.to_bytes()).decode('ascii'),
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        path = self._checkpoint_path(output_file)
+        with open(path + ".tmp", "w", encoding="utf-8") as tmp:
+            json.dump(checkpoint, tmp)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _truncate(path, size):
+        """Cut path back to size bytes, if it has grown past it"""
+        if size is not None and os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def _merge_incremental_export(self, output_file, new_file, session_start):
+        """Put the messages from an incremental export in front of the old transcript
+
+        The transcript runs newest first, so the result is the new session
+        followed by the previous file unchanged.
+        """
+        merged_file = output_file + ".tmp"
+        with open(merged_file, "w", encoding="utf-8") as merged:
+            merged.write(session_start)
+            for path in (new_file, output_file):
+                with open(path, "r", encoding="utf-8") as part:
+                    shutil.copyfileobj(part, merged)
+            merged.flush()
+            os.fsync(merged.fileno())
+        os.replace(merged_file, output_file)
+        os.remove(new_file)
+
+    def _merge_incremental_jsonl(self, structured_file, new_file):
+        """Put new JSONL records in front of the old ones, renumbering the old seq values"""
+        with open(new_file, "r", encoding="utf-8") as new:
+            new_count = sum(1 for _ in new)
+
+        if not os.path.exists(structured_file):
+            os.replace(new_file, structured_file)
+            return
+
+        merged_file = structured_file + ".tmp"
+        with open(merged_file, "w", encoding="utf-8") as merged:
+            with open(new_file, "r", encoding="utf-8") as new:
+                shutil.copyfileobj(new, merged)
+            with open(structured_file, "r", encoding="utf-8") as old:
+                for line in old:
+                    record = json.loads(line)
+                    record['seq'] += new_count
+                    merged.write(json.dumps(record, ensure_ascii=False) + "\n")
+            merged.flush()
+            os.fsync(merged.fileno())
+        os.replace(merged_file, structured_file)
+        os.remove(new_file)
+
+    def _seek_checkpoint_anchor(self, messages_container, message_xpath, sender_xpaths, anchor, scheduler):
+        """Scroll back to the oldest message of an interrupted export
+
+        Nothing is extracted on the way; each step only fingerprints the newly
+        loaded messages. Gives up once loading stops making progress.
+
+        Returns:
+            bool: True if the anchor was found
+        """
+        target = [anchor >> 32, anchor & 0xFFFFFFFF]
+        checked = 0
+        while self.running.is_set():
+            result = self.driver.execute_script(
+                PAGE_HELPERS_JS + "return window.__messengerExporter.seek(arguments[0], arguments[1], arguments[2], arguments[3], arguments[4]);",
+                messages_container,
+                message_xpath,
+                sender_xpaths,
+                target,
+                checked
+            )
+            if result['found']:
+                return True
+            if result['first'] is None:
+                time.sleep(1)
+                continue
+
+            checked = result['checked']
+            self.events.put({
+                'type': 'status',
+                'message': f"Skipping to where the last export stopped ({result['count']} messages loaded)...",
+                'level': 'info'
+            })
+
+            # Jump as far as the list allows, nothing below needs reading
+            self._scroll_up(messages_container, result['first'], fraction=1000)
+            loaded = self._wait_for_older_messages(
+                scheduler, messages_container, result['first'], message_xpath, warn=False
+            )
+            if not loaded and scheduler.should_warn():
+                scheduler.reset_backoff()
+                return False
+        return False
+
+
+# Smallest zoom the exporter will set; text below this stops rendering reliably
+MIN_ZOOM = 0.25
+
+# Downloads the text export never looks at. Image messages are still
+# recognised from their <img> tags, which stay in the page when blocked.
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.ico*",
+    "*.mp4*", "*.webm*", "*.m4a*", "*.mp3*", "*.ogg*",
+    "*.woff*", "*.woff2*", "*.ttf*", "*.otf*",
+    "*video*.fbcdn.net/*",
+]
+
+
+def create_chrome(profile_dir=None, headless=False):
+    """Start Chrome, optionally with its own persistent profile directory"""
+    load_selenium()
+    options = webdriver.ChromeOptions()
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,2000")
+    return webdriver.Chrome(options=options)
+
+
+def block_resources(driver, enabled=True):
+    """Stop the page downloading images, media and fonts, or allow them again
+
+    Returns:
+        bool: False if the driver does not support the DevTools protocol
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.setBlockedURLs",
+            {'urls': BLOCKED_RESOURCE_PATTERNS if enabled else []}
+        )
+        return True
+    except Exception as e:
+        print(f"Debug: Could not change blocked resources: {e}", file=sys.stderr)
+        return False
+
+
+def set_cookies(driver, cookies):
+    """Set all cookies in one DevTools call, before any page is loaded
+
+    Falls back to loading facebook.com and adding them one at a time when
+    the driver does not speak the DevTools protocol.
+    """
+    params = []
+    for cookie in cookies:
+        param = {
+            'name': cookie['name'],
+            'value': cookie['value'],
+            'domain': cookie['domain'],
+            'path': cookie.get('path', '/'),
+            'secure': bool(cookie.get('secure', False)),
+            'httpOnly': bool(cookie.get('httpOnly', False)),
+        }
+        if 'expiry' in cookie:
+            param['expires'] = cookie['expiry']
+        if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+            param['sameSite'] = cookie['sameSite']
+        params.append(param)
+
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {'cookies': params})
+    except Exception as e:
+        print(f"Debug: Falling back to add_cookie: {e}", file=sys.stderr)
+        driver.get("https://www.facebook.com")
+        for cookie in cookies:
+            driver.add_cookie(cookie)
+
+
+class CookieCache:
+    """Known-good Facebook cookies, saved after a successful login
+
+    load() only returns the jar if the session cookies are all there and
+    none of them is about to expire, so a stale cache never costs a login.
+    """
+
+    REQUIRED = ('c_user', 'xs')
+    EXPIRY_MARGIN = 300  # Seconds a cookie must still be valid for
+
+    def __init__(self, path=None):
+        self.path = path or str(Path.home() / ".messenger_analyzer" / "cookies.json")
+
+    def load(self):
+        """Return the cached cookies, or None if there are none worth trying"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                cookies = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cookies, list):
+            return None
+
+        now = time.time()
+        valid = []
+        for cookie in cookies:
+            if not isinstance(cookie, dict) or not all(k in cookie for k in ('name', 'value', 'domain')):
+                continue
+            if 'expiry' in cookie and cookie['expiry'] <= now + self.EXPIRY_MARGIN:
+                continue
+            valid.append(cookie)
+
+        names = {cookie['name'] for cookie in valid}
+        if not all(name in names for name in self.REQUIRED):
+            return None
+        return valid
+
+    def save(self, cookies):
+        """Write the jar atomically, readable by the current user only"""
+        if not all(name in {cookie['name'] for cookie in cookies} for name in self.REQUIRED):
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        try:
+            os.remove(temp_path)  # Left by a crash, and maybe with looser permissions
+        except OSError:
+            pass
+        # Created 0600 so the session tokens are never readable by anyone else
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cookies, f)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class BrowserSession:
+    """Keeps one Chrome instance alive between exports
+
+    The browser runs on a persistent profile directory, so the Facebook login
+    survives restarts too. acquire() hands out the running driver after a
+    health check and only launches a new one if the old one is gone.
+    release() leaves it running for the next export; close() quits it.
+    A new browser gets the cached cookie jar before its first page load.
+    """
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir or str(Path.home() / ".messenger_analyzer" / "profiles" / "main")
+        self.cookie_cache = CookieCache()
+        self.driver = None
+        self.lock = threading.Lock()
+        self.warm_thread = None
+
+    def prewarm(self):
+        """Launch the browser in the background so it is ready by step 3"""
+        if self.warm_thread is not None and self.warm_thread.is_alive():
+            return
+        self.warm_thread = threading.Thread(target=self._prewarm)
+        self.warm_thread.daemon = True
+        self.warm_thread.start()
+
+    def _prewarm(self):
+        try:
+            self.acquire()
+        except Exception as e:
+            print(f"Debug: Could not prewarm the browser: {e}", file=sys.stderr)
+
+    def is_healthy(self):
+        """Check the browser is still open and answering"""
+        if self.driver is None:
+            return False
+        try:
+            return bool(self.driver.window_handles) and \
+                self.driver.execute_script("return document.readyState") is not None
+        except:
+            return False
+
+    def acquire(self):
+        """Return a live driver on facebook.com, launching Chrome if needed"""
+        with self.lock:
+            if not self.is_healthy():
+                self._quit()
+                self.driver = create_chrome(self.profile_dir)
+                self.driver.maximize_window()
+                cookies = self.cookie_cache.load()
+                if cookies:
+                    set_cookies(self.driver, cookies)
+                self.driver.get("https://www.facebook.com")
+            return self.driver
+
+    def release(self):
+        """Keep the browser for the next export, dropping it if it is broken"""
+        with self.lock:
+            if not self.is_healthy():
+                self._quit()
+
+    def close(self):
+        """Quit the browser"""
+        with self.lock:
+            self._quit()
+
+    def _quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except:
+                pass
+            self.driver = None
+
+
+def parse_cookies(cookies_str):
+    """Turn a JSON cookie export into cookie dicts for WebDriver.add_cookie
+
+    Raises:
+        json.JSONDecodeError: If the text is not JSON
+        ValueError: If the cookies are not a list or miss required fields
+    """
+    if not cookies_str:
+        raise ValueError("No cookies provided")
+
+    cookies = json.loads(cookies_str)
+    if not isinstance(cookies, list):
+        raise ValueError("Cookies must be a JSON array")
+
+    parsed = []
+    for cookie in cookies:
+        required_fields = ['name', 'value', 'domain']
+        missing_fields = [field for field in required_fields if field not in cookie]
+        if missing_fields:
+            raise ValueError(f"Cookie missing required fields: {', '.join(missing_fields)}")
+
+        # Construct properly formatted cookie
+        cookie_dict = {
+            'name': cookie['name'],
+            'value': cookie['value'],
+            'domain': cookie['domain'],
+            'path': cookie.get('path', '/'),
+        }
+
+        # Optional fields
+        if 'expirationDate' in cookie:
+            cookie_dict['expiry'] = int(cookie['expirationDate'])
+        if 'secure' in cookie:
+            cookie_dict['secure'] = cookie['secure']
+        if 'httpOnly' in cookie:
+            cookie_dict['httpOnly'] = cookie['httpOnly']
+
+        parsed.append(cookie_dict)
+    return parsed
+
+
+def wait_for_login(driver, running, timeout=300):
+    """Wait until the Facebook header shows up
+
+    The wait runs in the page and returns as soon as the header renders. It
+    is split into short slices so clearing running cancels it; a navigation
+    (such as submitting the login form) ends a slice early and the next one
+    waits on the new page.
+
+    Returns:
+        bool: True if logged in before the timeout or running was cleared
+    """
+    deadline = time.monotonic() + timeout
+    while running.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        wait_slice = min(remaining, 2.0)
+        try:
+            driver.set_script_timeout(wait_slice + 5)
+            if driver.execute_async_script(
+                PAGE_HELPERS_JS + "window.__messengerExporter.waitForSelector(arguments[0], arguments[1], arguments[arguments.length - 1]);",
+                "[aria-label='Facebook']",
+                int(wait_slice * 1000)
+            ):
+                return True
+        except WebDriverException:
+            # The page unloaded under the script, give the next one a moment
+            time.sleep(0.2)
+    return False
+
+
+def conversation_url(conversation):
+    """Accept a Messenger URL or a bare thread ID and return the chat URL"""
+    conversation = conversation.strip()
+    if conversation.isdigit():
+        return f"https://www.facebook.com/messages/t/{conversation}/"
+    if conversation.startswith(("https://", "http://")):
+        return conversation
+    raise ValueError(f"Not a conversation URL or thread ID: {conversation}")
+
+
+def conversation_output_file(output_dir, url):
+    """Transcript path for a conversation, named after its thread ID"""
+    thread_id = url.rstrip('/').rsplit('/', 1)[-1] or "conversation"
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in thread_id)
+    return os.path.join(output_dir, f"{safe_name}.txt")
+
+
+class _WorkerEvents:
+    """Passes a batch worker's events on to the shared queue
+
+    Status lines are tagged with the worker name and sent as batch_status.
+    Per-message echoes and the single-chat completion signals are dropped.
+    """
+
+    def __init__(self, events, name):
+        self.events = events
+        self.name = name
+
+    def put(self, event):
+        if event.get('type') != 'status' or event.get('echo'):
+            return
+        forwarded = {
+            'type': 'batch_status',
+            'message': f"[{self.name}] {event['message']}",
+            'level': event['level']
+        }
+        if event.get('coalesce'):
+            forwarded['coalesce'] = f"{self.name}:{event['coalesce']}"
+        self.events.put(forwarded)
+
+
+class BatchExporter:
+    """Exports a list of conversations over a pool of Chrome sessions
+
+    Each worker runs its own browser with its own profile directory and takes
+    conversations from a shared queue, writing each one to its own file in
+    output_dir. The workers share one account, so per_account_limit caps how
+    many of them load a chat at the same time. Progress goes to events as
+    batch_status and batch_progress dicts.
+    """
+
+    def __init__(self, conversations, output_dir, events, workers=2, per_account_limit=2,
+                 cookies=None, profile_root=None, job_options=None, headless=False):
+        self.conversations = conversations
+        self.output_dir = output_dir
+        self.events = events
+        self.workers = max(1, min(workers, len(conversations)))
+        self.account_slots = threading.BoundedSemaphore(max(1, per_account_limit))
+        self.cookies = cookies or CookieCache().load()
+        self.profile_root = profile_root or str(Path.home() / ".messenger_analyzer" / "profiles")
+        self.job_options = job_options or {}
+        self.headless = headless
+
+        self.running = threading.Event()
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.done = 0
+        self.failed = 0
+        self.active = 0
+        self.live_workers = 0
+
+    def start(self):
+        """Start the worker threads"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        for url in self.conversations:
+            self.pending.put(url)
+
+        self.running.set()
+        self.live_workers = self.workers
+        self._report_progress()
+        for number in range(1, self.workers + 1):
+            thread = threading.Thread(target=self._worker, args=(f"worker-{number}",))
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Ask every worker to stop after its current batch of messages"""
+        self.running.clear()
+
+    def is_alive(self):
+        with self.lock:
+            return self.live_workers > 0
+
+    def _status(self, message, level="info"):
+        self.events.put({
+            'type': 'batch_status',
+            'message': message,
+            'level': level
+        })
+
+    def _report_progress(self):
+        with self.lock:
+            self.events.put({
+                'type': 'batch_progress',
+                'coalesce': 'batch_progress',
+                'done': self.done,
+                'failed': self.failed,
+                'running': self.active,
+                'total': len(self.conversations),
+                'finished': self.live_workers == 0
+            })
+
+    def _login(self, driver, name):
+        """Log a worker's browser in, reusing its profile when it still has a session"""
+        if self.cookies:
+            set_cookies(driver, self.cookies)
+        driver.get("https://www.facebook.com")
+        if not self.cookies:
+            if self.headless:
+                self._status(f"[{name}] No saved login to use in a background browser", "error")
+                return False
+            self._status(f"[{name}] Log in to Facebook in this browser window if asked...")
+        if wait_for_login(driver, self.running):
+            return True
+        if self.running.is_set():
+            self._status(f"[{name}] Login timed out, stopping this browser", "error")
+        return False
+
+    def _worker(self, name):
+        events = _WorkerEvents(self.events, name)
+        driver = None
+        try:
+            driver = create_chrome(os.path.join(self.profile_root, name), headless=self.headless)
+            if not self._login(driver, name):
+                return
+
+            while self.running.is_set():
+                try:
+                    url = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+
+                finished = False
+                with self.account_slots:
+                    if not self.running.is_set():
+                        break
+                    with self.lock:
+                        self.active += 1
+                    self._report_progress()
+                    self._status(f"[{name}] Exporting {url}")
+                    try:
+                        driver.get(url)
+                        job = ChatExportJob(
+                            driver,
+                            conversation_output_file(self.output_dir, url),
+                            events,
+                            self.running,
+                            interactive=False,
+                            **self.job_options
+                        )
+                        finished = job.run()
+                    except Exception as e:
+                        self._status(f"[{name}] Export of {url} failed: {str(e)}", "error")
+                    finally:
+                        with self.lock:
+                            self.active -= 1
+
+                with self.lock:
+                    if finished:
+                        self.done += 1
+                    elif self.running.is_set():
+                        self.failed += 1
+                self._report_progress()
+
+        except Exception as e:
+            self._status(f"[{name}] Browser error: {str(e)}", "error")
+        finally:
+            if driver:
+                try:
+                    driver.quit()
+                except:
+                    pass
+            with self.lock:
+                self.live_workers -= 1
+            self._report_progress()
+
+
+class EventBus:
+    """Bounded event queue from worker threads to the GUI
+
+    put() takes the same dicts a queue.Queue did. An event with a 'coalesce'
+    key replaces a pending event with the same key instead of queueing
+    behind it, so a slow GUI only sees the latest progress. Exported message
+    echoes are dropped once max_echoes are waiting, and other events block
+    their worker thread while maxsize are waiting. The first event after the
+    GUI has caught up calls wake(), so an idle GUI is never polled.
+    """
+
+    def __init__(self, maxsize=5000, max_echoes=500):
+        self.maxsize = maxsize
+        self.max_echoes = max_echoes
+        self.wake = None
+        self.closed = False
+        self._cond = threading.Condition()
+        self._slots = deque()  # Events, or coalesce keys looked up in _latest
+        self._latest = {}
+        self._echoes = 0
+        self._dropped = 0
+        self._wake_pending = False
+
+    def put(self, event):
+        key = event.get('coalesce')
+        with self._cond:
+            if key is not None and key in self._latest:
+                self._latest[key] = event
+                return
+
+            if event.get('echo'):
+                if self._echoes >= self.max_echoes:
+                    self._dropped += 1
+                    return
+                self._echoes += 1
+            elif threading.current_thread() is not threading.main_thread():
+                # Backpressure, but never on the GUI thread that drains us
+                while len(self._slots) >= self.maxsize and not self.closed:
+                    self._cond.wait(1)
+
+            if key is not None:
+                self._latest[key] = event
+                self._slots.append(key)
+            else:
+                self._slots.append(event)
+
+            wake = not self._wake_pending
+            self._wake_pending = True
+
+        if wake:
+            self._wake()
+
+    def get_batch(self, limit=500):
+        """Take up to limit events, oldest first
+
+        Returns:
+            tuple: (events, True if more are still waiting)
+        """
+        with self._cond:
+            events = []
+            while self._slots and len(events) < limit:
+                slot = self._slots.popleft()
+                event = self._latest.pop(slot) if isinstance(slot, str) else slot
+                if event.get('echo'):
+                    self._echoes -= 1
+                events.append(event)
+
+            if self._dropped and not self._echoes:
+                events.append({
+                    'type': 'status',
+                    'message': f'({self._dropped} messages saved but not shown here)',
+                    'level': 'info'
+                })
+                self._dropped = 0
+
+            more = bool(self._slots)
+            if not more:
+                self._wake_pending = False
+            self._cond.notify_all()
+            return events, more
+
+    def close(self):
+        """Release any worker blocked on a full bus"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def _wake(self):
+        try:
+            self.wake()
+        except Exception:
+            # The GUI is not listening (yet), let the next event try again
+            with self._cond:
+                self._wake_pending = False
+
+
+class StatusLog:
+    """Read-only textbox that keeps only its last max_lines lines
+
+    add() only buffers a line; flush() writes everything buffered in one
+    insert and drops the oldest lines, so the GUI calls it once per tick.
+    """
+
+    def __init__(self, textbox, max_lines=1000):
+        self.textbox = textbox
+        self.max_lines = max_lines
+        self.pending = deque(maxlen=max_lines)
+        self.lines = 0
+
+    def add(self, message):
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.pending.append(f"[{timestamp}] {message}\n")
+
+    def flush(self):
+        if not self.pending:
+            return
+        text = "".join(self.pending)
+        self.pending.clear()
+
+        self.textbox.configure(state="normal")
+        self.textbox.insert("end", text)
+        self.lines += text.count("\n")
+        excess = self.lines - self.max_lines
+        if excess > 0:
+            self.textbox.delete("1.0", f"{excess + 1}.0")
+            self.lines -= excess
+        self.textbox.configure(state="disabled")
+        self.textbox.see("end")
+
 
-# Only class
 class ModernMessengerExporter:
-    def __init__(self):
+    STARTUP_DELAY_MS = 50  # After the window maps, before building steps 2-4
+
+    def __init__(self, prewarm=True):
+        """
+        Args:
+            prewarm (bool): Start Chrome in the background once the window is up
+        """
         # Existing initialization code remains the same
+        self.prewarm = prewarm
+        self.started = False  # Set once the steps after the first are built
         self.root = ctk.CTk()
         self.root.title("Facebook Messenger Analyzer")
         self.root.geometry("800x800")
@@ -39,9 +2699,8 @@ class ModernMessengerExporter:
         self.selenium_running = threading.Event()
         self.export_running = threading.Event()
 
-        # Queues for thread communication
-        self.message_queue = queue.Queue()
-        self.command_queue = queue.Queue()
+        # Events from worker threads, handled when Tk is woken for them
+        self.events = EventBus()
 
         # Thread handles
         self.selenium_thread = None
@@ -49,56 +2708,73 @@ class ModernMessengerExporter:
         self.cleanup_thread = None
         self.analysis_thread = None
 
-        # Selenium driver
+        # Batch export of several conversations
+        self.batch_exporter = None
+        self.batch_window = None
+
+        # Selenium driver, borrowed from a browser that stays open between exports
+        self.browser = BrowserSession()
         self.driver = None
         self.driver_lock = threading.Lock()
 
         self.setup_variables()
         self.create_gui()
-        self.process_queues()
-        self.processed_messages = set()
+        self.root.bind("<<ExporterEvents>>", self.process_events)
+        self.events.wake = lambda: self.root.event_generate("<<ExporterEvents>>", when="tail")
 
     def setup_variables(self):
         """Initialize all variables needed for the application"""
         self.current_step = 1
         self.login_verified = False
-        self.processed_messages = set()
         self.last_scroll_time = 0
         self.same_message_count = 0
 
         # GUI state variables
         self.login_method = ctk.StringVar(value="manual")
         self.chat_type = ctk.StringVar(value="individual")
+        self.extraction_mode = ctk.StringVar(value="batch")
+        self.scroll_mode = ctk.StringVar(value="container")
+        self.export_mode = ctk.StringVar(value="full")
+        self.flush_each_message = ctk.BooleanVar(value=False)
+        self.write_jsonl = ctk.BooleanVar(value=True)
+        self.write_database = ctk.BooleanVar(value=False)
+        self.block_media = ctk.BooleanVar(value=True)
+        self.messages_per_pass = ctk.StringVar(value="50")
+        self.trim_dom = ctk.BooleanVar(value=False)
+        self.log_summary_only = ctk.BooleanVar(value=False)
+        self.batch_headless = ctk.BooleanVar(value=False)
+        self.batch_workers = ctk.StringVar(value="2")
+        self.batch_account_limit = ctk.StringVar(value="2")
         self.output_path = ctk.StringVar(value=str(Path.home() / "Downloads" / "conversation.txt"))
 
-    def process_queues(self):
-        """Process message and command queues"""
+    def process_events(self, event=None):
+        """Handle the events waiting on the bus"""
+        events, more = self.events.get_batch()
         try:
-            # Process status messages
-            while True:
-                try:
-                    msg = self.message_queue.get_nowait()
-                    if msg.get('type') == 'status':
-                        self._update_status(msg['message'], msg['level'])
-                    elif msg.get('type') == 'complete':
-                        self._handle_completion()
-                    self.message_queue.task_done()
-                except queue.Empty:
-                    break
-
-            # Process commands
-            while True:
-                try:
-                    cmd = self.command_queue.get_nowait()
-                    if cmd.get('type') == 'enable_button':
-                        self.export_button.configure(state="normal")
-                    elif cmd.get('type') == 'update_button':
-                        self.export_button.configure(**cmd['properties'])
-                    self.command_queue.task_done()
-                except queue.Empty:
-                    break
+            for msg in events:
+                if msg.get('type') == 'status':
+                    self._update_status(msg['message'], msg['level'], msg.get('echo', False))
+                elif msg.get('type') == 'complete':
+                    self._handle_completion()
+                elif msg.get('type') == 'scroll_warning':
+                    self.create_scroll_warning_popup()
+                elif msg.get('type') == 'batch_status':
+                    self._update_batch_status(msg['message'], msg['level'])
+                elif msg.get('type') == 'batch_progress':
+                    self._update_batch_progress(msg)
+                elif msg.get('type') == 'enable_button':
+                    self.export_button.configure(state="normal")
+                elif msg.get('type') == 'update_button':
+                    self.export_button.configure(**msg['properties'])
+
+            # One textbox update per batch, however many lines arrived
+            self.status_log.flush()
+            if self.batch_window is not None and self.batch_window.winfo_exists():
+                self.batch_status_log.flush()
         finally:
-            self.root.after(100, self.process_queues)
+            if more:
+                # Let Tk redraw before the next batch
+                self.root.after(1, self.process_events)
 
     def create_gui(self):
         """Updated GUI creation to include step 4"""
@@ -116,12 +2792,10 @@ class ModernMessengerExporter:
         self.content_area = ctk.CTkFrame(self.main_container, fg_color="transparent")
         self.content_area.pack(fill="both", expand=True, pady=10)
 
-        # Create all step frames
+        # Only the first step is needed to draw the window, the rest are
+        # built once it is on screen
         self.step_frames = {
-            1: self.create_step1_frame(),
-            2: self.create_step2_frame(),
-            3: self.create_step3_frame(),
-            4: self.create_step4_frame()
+            1: self.create_step1_frame()
         }
 
         # Navigation Buttons
@@ -130,6 +2804,36 @@ class ModernMessengerExporter:
         # Show first step
         self.show_step(1)
 
+    def _on_first_map(self, event):
+        """Build the rest of the app once the window is on screen
+
+        An after(0) timer would fire before Tk has seen the window's Map and
+        Expose events, so nothing would be painted yet. The short delay lets
+        the expose arrive, and after_idle then runs behind the redraw.
+        """
+        if event.widget is not self.root or self.started:
+            return
+        self.root.after(self.STARTUP_DELAY_MS, lambda: self.root.after_idle(self._finish_startup))
+
+    def _finish_startup(self):
+        """Build the remaining steps and warm up the browser after the first frame"""
+        if self.started:
+            return
+        self.started = True
+        self.root.update_idletasks()
+
+        self.step_frames[2] = self.create_step2_frame()
+        self.step_frames[3] = self.create_step3_frame()
+        self.step_frames[4] = self.create_step4_frame()
+
+        if self.current_step in (1, 2):
+            self._prewarm_browser()
+
+    def _prewarm_browser(self):
+        """Get Chrome, and with it Selenium, loading while the user picks options"""
+        if self.prewarm:
+            self.browser.prewarm()
+
     def create_header(self):
         """Create the header section"""
         header_frame = ctk.CTkFrame(self.main_container, fg_color="transparent")
@@ -202,32 +2906,20 @@ class ModernMessengerExporter:
 
     def _perform_analysis(self):
         """Perform the chat analysis using Flask API"""
+        import requests
         try:
-            # Read the chat file
-            with open(self.output_path.get(), 'r', encoding='utf-8') as f:
-                chat_content = f.read()
-
             # Update status
             self._update_analysis_status("Analyzing chat content\n")
 
-            # Make request to Flask API
-            import requests
-            response = requests.post(
-                'https://messenger-analysis-api-k63dd.ondigitalocean.app/analyze',
-                json={'chat_content': chat_content},
-                headers={'Content-Type': 'application/json'}
+            analysis = analyze_transcript(
+                self.output_path.get(),
+                on_progress=self._analysis_progress,
+                cache=AnalysisCache()
             )
 
-            if response.status_code == 200:
-                # Get the analysis from response
-                analysis = response.json()['analysis']
-
-                # Update GUI with analysis
-                self._update_analysis_status(analysis)
-                self._update_analysis_status("\nAnalysis complete!")
-            else:
-                error_message = response.json().get('error', 'Unknown error occurred')
-                self._update_analysis_status(f"\nError during analysis: {error_message}")
+            # Update GUI with analysis
+            self._update_analysis_status(analysis)
+            self._update_analysis_status("\nAnalysis complete!")
 
         except requests.exceptions.ConnectionError:
             self._update_analysis_status(
@@ -237,6 +2929,12 @@ class ModernMessengerExporter:
         finally:
             self.root.after(0, lambda: self.analyze_button.configure(state="normal"))
 
+    def _analysis_progress(self, done, parts):
+        """Report each analysed part of a long chat as it comes back"""
+        self._update_analysis_status(f"Analysed part {done} of {parts}")
+        if done == parts:
+            self._update_analysis_status("Combining the parts...")
+
     def _update_analysis_status(self, message):
         """Update the analysis status text in a thread-safe way"""
 
@@ -403,7 +3101,7 @@ class ModernMessengerExporter:
         instructions = [
             "1. Click 'Start Export' below",
             "2. Select the conversation you want to save in the Facebook window",
-            "3. (Optional for better performance) Zoom out as far as possible using 'Ctrl -' or 'Command -'",
+            "3. The page is zoomed out for you to fit more messages per pass (turn this off below)",
             "4. Click confirm. Wait while we save your messages. You may be prompted to scroll up in the chat.",
             "5. Your file will be saved automatically."
         ]
@@ -415,6 +3113,68 @@ class ModernMessengerExporter:
             )
             instruction_label.pack(pady=(0, 2))
 
+        # Export Options. Each group wraps onto rows that fit the 800 px window.
+        self._radio_group(frame, "Extraction:", self.extraction_mode, [
+            ("Fast (whole page at once)", "batch"),
+            ("Streaming (new messages only)", "stream"),
+            ("Compatible (one message at a time)", "element")
+        ], columns=2)
+
+        self._radio_group(frame, "Scrolling:", self.scroll_mode, [
+            ("Direct (scroll the chat list)", "container"),
+            ("Keyboard (hover and Page Up)", "keys")
+        ])
+
+        self._radio_group(frame, "Export:", self.export_mode, [
+            ("Whole chat", "full"),
+            ("Resume interrupted export", "resume"),
+            ("Only messages since last export", "incremental")
+        ])
+
+        checks_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        checks_frame.pack(fill="x", pady=5)
+
+        checks = [
+            ("Also save a structured .jsonl file", self.write_jsonl),
+            ("Save every message to disk immediately (slower)", self.flush_each_message),
+            ("Add to searchable database (messenger.db)", self.write_database),
+            ("Skip images, video and fonts while exporting (faster)", self.block_media),
+            ("Log progress only", self.log_summary_only)
+        ]
+        for i, (text, variable) in enumerate(checks):
+            ctk.CTkCheckBox(
+                checks_frame,
+                text=text,
+                variable=variable
+            ).grid(row=i // 2, column=i % 2, padx=10, pady=(0, 5), sticky="w")
+
+        zoom_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        zoom_frame.pack(fill="x", pady=(0, 5))
+
+        ctk.CTkLabel(
+            zoom_frame,
+            text="Messages per pass:"
+        ).pack(side="left", padx=10)
+
+        ctk.CTkOptionMenu(
+            zoom_frame,
+            values=["Off", "25", "50", "100", "200"],
+            variable=self.messages_per_pass,
+            width=90
+        ).pack(side="left")
+
+        ctk.CTkCheckBox(
+            zoom_frame,
+            text="Trim saved messages from the page (for very long chats)",
+            variable=self.trim_dom
+        ).pack(side="left", padx=20)
+
+        ctk.CTkButton(
+            frame,
+            text="Batch export several chats...",
+            command=self.create_batch_window
+        ).pack(pady=5)
+
         # Status Display
         status_frame = ctk.CTkFrame(frame)
         status_frame.pack(fill="both", expand=True, pady=5)
@@ -425,9 +3185,30 @@ class ModernMessengerExporter:
             state="disabled"
         )
         self.status_text.pack(fill="both", expand=True, padx=10, pady=5)
+        self.status_log = StatusLog(self.status_text)
 
         return frame
 
+    def _radio_group(self, parent, title, variable, choices, columns=3):
+        """Add a titled row of radio buttons, wrapped after every `columns` choices"""
+        group = ctk.CTkFrame(parent)
+        group.pack(fill="x", pady=5)
+
+        ctk.CTkLabel(
+            group,
+            text=title,
+            font=ctk.CTkFont(weight="bold")
+        ).grid(row=0, column=0, padx=10, pady=5, sticky="nw")
+
+        for i, (text, value) in enumerate(choices):
+            ctk.CTkRadioButton(
+                group,
+                text=text,
+                variable=variable,
+                value=value
+            ).grid(row=i // columns, column=1 + i % columns, padx=10, pady=5, sticky="w")
+        return group
+
     def create_step4_frame(self):
         """Create the analysis frame without API key input"""
         frame = ctk.CTkFrame(self.content_area, fg_color="transparent")
@@ -497,6 +3278,9 @@ class ModernMessengerExporter:
 
     def show_step(self, step_number):
         """Updated show_step method to include step 4"""
+        if step_number not in self.step_frames:
+            self._finish_startup()
+
         # Hide all frames
         for frame in self.step_frames.values():
             frame.pack_forget()
@@ -519,7 +3303,11 @@ class ModernMessengerExporter:
         # Handle button visibility
         self.next_button.pack_forget()
         self.export_button.pack_forget()
-        self.analyze_button.pack_forget()
+        if self.started:
+            self.analyze_button.pack_forget()  # Built with step 4
+
+        if step_number in (1, 2) and self.started:
+            self._prewarm_browser()
 
         if step_number == 3:
             self.export_button.pack(side="right")
@@ -540,24 +3328,23 @@ class ModernMessengerExporter:
         if self.current_step < 3:
             self.show_step(self.current_step + 1)
 
-    def _update_status(self, message, level="info"):
-        """Update status text in a thread-safe way"""
-        self.status_text.configure(state="normal")
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.status_text.insert("end", f"[{timestamp}] {message}\n")
-        self.status_text.configure(state="disabled")
-        self.status_text.see("end")
+    def _update_status(self, message, level="info", echo=False):
+        """Queue a status line, written out on the next tick
+
+        Args:
+            echo (bool): The line is an exported message rather than progress
+        """
+        if echo and self.log_summary_only.get():
+            return
+        self.status_log.add(message)
 
     def _handle_completion(self):
         """Handle export completion and move to analysis step"""
         self.selenium_running.clear()
         self.export_running.clear()
-        if self.driver:
-            try:
-                self.driver.quit()
-            except:
-                pass
-            self.driver = None
+        self.cleanup_thread = threading.Thread(target=self._release_driver)
+        self.cleanup_thread.daemon = True
+        self.cleanup_thread.start()
         self._reset_export_button()
         # Move to analysis step
         self.root.after(0, lambda: self.show_step(4))
@@ -616,7 +3403,7 @@ class ModernMessengerExporter:
         self.cleanup_thread.daemon = True
         self.cleanup_thread.start()
 
-        self.message_queue.put({
+        self.events.put({
             'type': 'status',
             'message': 'Cleaning up resources in background...',
             'level': 'info'
@@ -625,18 +3412,15 @@ class ModernMessengerExporter:
     def _cleanup(self):
         """Clean up resources in separate thread"""
         try:
-            with self.driver_lock:
-                if self.driver:
-                    self.driver.quit()
-                    self.driver = None
+            self._release_driver()
         except Exception as e:
-            self.message_queue.put({
+            self.events.put({
                 'type': 'status',
                 'message': f'Error during cleanup: {str(e)}',
                 'level': 'error'
             })
         finally:
-            self.command_queue.put({
+            self.events.put({
                 'type': 'update_button',
                 'properties': {
                     'text': 'Start Export',
@@ -646,22 +3430,45 @@ class ModernMessengerExporter:
                 }
             })
 
+    def _release_driver(self):
+        """Hand the driver back to the browser session, which stays open"""
+        with self.driver_lock:
+            if self.driver:
+                self.driver = None
+                self.browser.release()
+
     def initialize_selenium(self):
         """Initialize Selenium in separate thread"""
         try:
+            self.events.put({
+                'type': 'status',
+                'message': 'Connecting to the browser...',
+                'level': 'info'
+            })
             with self.driver_lock:
-                self.driver = webdriver.Chrome()
-                self.driver.maximize_window()
-                self.driver.get("https://www.facebook.com")
+                self.driver = self.browser.acquire()
+                if not self.driver.current_url.startswith("https://www.facebook.com"):
+                    self.driver.get("https://www.facebook.com")
 
-            # Handle login
-            if self.login_method.get() == "cookies":
-                self._handle_cookie_login()
+            # Handle login, unless the browser profile is still logged in
+            if wait_for_login(self.driver, self.selenium_running, timeout=3):
+                self.events.put({
+                    'type': 'status',
+                    'message': 'Already logged in',
+                    'level': 'info'
+                })
+                self._save_login_cookies()
+                self.driver.get("https://www.facebook.com/messages/t/")
             else:
-                self._handle_manual_login()
+                # Whatever was cached did not get us in, so stop trying it
+                self.browser.cookie_cache.clear()
+                if self.login_method.get() == "cookies":
+                    self._handle_cookie_login()
+                else:
+                    self._handle_manual_login()
 
             if self.selenium_running.is_set():
-                self.message_queue.put({
+                self.events.put({
                     'type': 'status',
                     'message': 'Please select the conversation to export.',
                     'level': 'info'
@@ -669,7 +3476,7 @@ class ModernMessengerExporter:
                 self.root.after(1000, self.create_confirmation_popup)
 
         except Exception as e:
-            self.message_queue.put({
+            self.events.put({
                 'type': 'status',
                 'message': f'Error: {str(e)}',
                 'level': 'error'
@@ -680,55 +3487,26 @@ class ModernMessengerExporter:
         """Handle cookie-based login with proper error handling"""
         try:
             cookies_str = self.cookies_textbox.get("1.0", "end").strip()
-            if not cookies_str:
-                raise ValueError("No cookies provided")
-
-            cookies = json.loads(cookies_str)
-            if not isinstance(cookies, list):
-                raise ValueError("Cookies must be a JSON array")
-
-            for cookie in cookies:
-                required_fields = ['name', 'value', 'domain']
-                missing_fields = [field for field in required_fields if field not in cookie]
-                if missing_fields:
-                    raise ValueError(f"Cookie missing required fields: {', '.join(missing_fields)}")
-
-                # Construct properly formatted cookie
-                cookie_dict = {
-                    'name': cookie['name'],
-                    'value': cookie['value'],
-                    'domain': cookie['domain'],
-                    'path': cookie.get('path', '/'),
-                }
-
-                # Optional fields
-                if 'expirationDate' in cookie:
-                    cookie_dict['expiry'] = int(cookie['expirationDate'])
-                if 'secure' in cookie:
-                    cookie_dict['secure'] = cookie['secure']
-                if 'httpOnly' in cookie:
-                    cookie_dict['httpOnly'] = cookie['httpOnly']
-
-                self.driver.add_cookie(cookie_dict)
-
-            self.driver.refresh()
+            set_cookies(self.driver, parse_cookies(cookies_str))
+            self.driver.get("https://www.facebook.com")
 
             # Verify login success
             WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "[aria-label='Facebook']"))
             )
 
-            self.message_queue.put({
+            self.events.put({
                 'type': 'status',
                 'message': 'Successfully logged in using cookies',
                 'level': 'info'
             })
+            self._save_login_cookies()
 
             self.driver.get("https://www.facebook.com/messages/t/")
 
         except json.JSONDecodeError as e:
             error_msg = f"Invalid cookie format: {str(e)}"
-            self.message_queue.put({
+            self.events.put({
                 'type': 'status',
                 'message': error_msg + ". Using manual login.",
                 'level': 'warning'
@@ -737,7 +3515,7 @@ class ModernMessengerExporter:
 
         except ValueError as e:
             error_msg = f"Cookie validation error: {str(e)}"
-            self.message_queue.put({
+            self.events.put({
                 'type': 'status',
                 'message': error_msg + ". Using manual login.",
                 'level': 'warning'
@@ -746,30 +3524,31 @@ class ModernMessengerExporter:
 
         except Exception as e:
             error_msg = f"Cookie login error: {str(e)}"
-            self.message_queue.put({
+            self.events.put({
                 'type': 'status',
                 'message': error_msg + ". Using manual login.",
                 'level': 'warning'
             })
             self._handle_manual_login()
 
+    def _save_login_cookies(self):
+        """Remember the session cookies so the next browser starts logged in"""
+        try:
+            self.browser.cookie_cache.save(self.driver.get_cookies())
+        except Exception as e:
+            print(f"Debug: Could not cache cookies: {e}", file=sys.stderr)
+
     def _handle_manual_login(self):
         """Handle manual login process"""
-        self.message_queue.put({
+        self.events.put({
             'type': 'status',
             'message': 'Please log in to Facebook in the browser window...',
             'level': 'info'
         })
 
-        # Wait for login
-        start_time = time.time()
-        while time.time() - start_time < 300 and self.selenium_running.is_set():  # 5 minute timeout
-            try:
-                if len(self.driver.find_elements(By.CSS_SELECTOR, "[aria-label='Facebook']")) > 0:
-                    break
-            except:
-                pass
-            time.sleep(2)
+        # Wait for login, 5 minute timeout
+        if wait_for_login(self.driver, self.selenium_running):
+            self._save_login_cookies()
         self.driver.get("https://www.facebook.com/messages/t/")
 
     def create_confirmation_popup(self):
@@ -777,6 +3556,11 @@ class ModernMessengerExporter:
         if not self.selenium_running.is_set():
             return
 
+        if self._target_per_pass():
+            message = "Please select the chat you wish to export in the browser.\nClick confirm once you have done this."
+        else:
+            message = "Please select the chat you wish to export in the browser.\nPlease then zoom out as far as possible using 'Ctrl -' or 'Command -'\nClick confirm once you have done this."
+
         popup = ctk.CTkToplevel(self.root)
         popup.title("Confirm Chat Selection")
         popup.geometry("600x300")
@@ -792,7 +3576,7 @@ class ModernMessengerExporter:
 
         ctk.CTkLabel(
             popup,
-            text="Please select the chat you wish to export in the browser.\nPlease then zoom out as far as possible using 'Ctrl -' or 'Command -'\nClick confirm once you have done this.",
+            text=message,
             font=ctk.CTkFont(size=16),
             justify="center"
         ).pack(pady=(50, 50))
@@ -834,41 +3618,38 @@ class ModernMessengerExporter:
         self.export_thread.daemon = True
         self.export_thread.start()
 
-    def get_message_identifier(self, message_element):
-        """Generate a unique identifier for a message using its text content and class names"""
+    def _export_messages(self):
+        """Run the export for the chat open in the browser"""
+        finished = False
         try:
-            # Get the full class name string
-            class_names = message_element.get_attribute("class")
-            # Get the text content - encode to handle emojis
-            text_content = message_element.text.encode('utf-8', 'ignore').decode('utf-8').strip()
-            # Get parent div's class names for additional context
-            parent_classes = message_element.find_element(By.XPATH, "..").get_attribute("class")
-
-            # Create a compound identifier
-            identifier = f"{class_names}|{parent_classes}|{text_content[:50]}"  # Use first 50 chars of text
-            return identifier
-        except Exception as e:
-            print(f"Debug: Error creating message identifier: {e}")
-            return None
+            with self.driver_lock:
+                if not self.driver:
+                    return
 
-    def _get_message_color(self, element):
-        try:
-            color = self.driver.execute_script("""
-                var element = arguments[0];
-                var bgColor = window.getComputedStyle(element).backgroundColor;
-                if (bgColor === 'rgba(0, 0, 0, 0)' || !bgColor) {
-                    var parent = element.parentElement;
-                    while (parent && window.getComputedStyle(parent).backgroundColor === 'rgba(0, 0, 0, 0)') {
-                        parent = parent.parentElement;
-                    }
-                    return parent ? window.getComputedStyle(parent).backgroundColor : null;
-                }
-                return bgColor;
-            """, element)
-            return color
-        except Exception as e:
-            print(f"Debug: Error getting color: {e}")
-            return None
+                job = ChatExportJob(
+                    self.driver,
+                    self.output_path.get(),
+                    self.events,
+                    self.export_running,
+                    chat_type=self.chat_type.get(),
+                    extraction_mode=self.extraction_mode.get(),
+                    scroll_mode=self.scroll_mode.get(),
+                    export_mode=self.export_mode.get(),
+                    durability="message" if self.flush_each_message.get() else "batch",
+                    write_jsonl=self.write_jsonl.get(),
+                    write_database=self.write_database.get(),
+                    block_media=self.block_media.get(),
+                    target_per_pass=self._target_per_pass(),
+                    trim_dom=self.trim_dom.get()
+                )
+                finished = job.run()
+        finally:
+            if not finished and self.export_running.is_set():
+                # Ended by an error rather than Stop, so nobody else resets the GUI
+                self.selenium_running.clear()
+                self.export_running.clear()
+            if not self.export_running.is_set():
+                self._cleanup()
 
     def create_scroll_warning_popup(self):
         """Create warning popup for scroll issues"""
@@ -921,270 +3702,160 @@ class ModernMessengerExporter:
         if stop:
             self.stop_export()
 
-    def _show_scroll_warning(self):
-        """Show scroll warning popup in a thread-safe way"""
-        self.root.after(0, self.create_scroll_warning_popup)
-
-    def _export_messages(self):
-        """Export messages with improved file handling and GUI updates"""
-        try:
-            with self.driver_lock:
-                if not self.driver:
-                    return
-
-                messages_container = None
-                last_message = None  # Track last status message
-                scroll_count = 0  # Track consecutive scroll messages
-
-                # Wait for messages container with timeout and stop check
-                start_time = time.time()
-                while time.time() - start_time < 30 and self.export_running.is_set():
-                    try:
-                        messages_container = self.driver.find_element(
-                            By.CSS_SELECTOR,
-                            "div.x78zum5.xdt5ytf.x1iyjqo2"
-                        )
-                        if messages_container:
-                            break
-                    except:
-                        time.sleep(0.5)
-
-                if not messages_container or not self.export_running.is_set():
-                    return
-
-                output_file = self.output_path.get()
-                os.makedirs(os.path.dirname(output_file), exist_ok=True)
-
-                # Open file in write mode first to clear it, then reopen in append mode
-                with open(output_file, "w", encoding="utf-8") as f:
-                    # Write initial session marker
-                    session_start = f"=== Export Session Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n"
-                    f.write(session_start)
-                    f.flush()
-                    self.message_queue.put({
-                        'type': 'status',
-                        'message': session_start.strip(),
-                        'level': 'info'
-                    })
+    def create_batch_window(self):
+        """Create the window for exporting several conversations at once"""
+        if self.batch_window is not None and self.batch_window.winfo_exists():
+            self.batch_window.lift()
+            return
 
-                # Reopen in append mode for the rest of the export
-                with open(output_file, "a", encoding="utf-8") as f:
-                    message_count = 0
-                    last_height = 0
-                    no_progress_count = 0
-                    message_xpath = ".//div/div/div/div/div/div/div/div/div/div/div/div/div/div/div/div/div/span/div/div/div/span/div"
-                    sender_xpath = "./ancestor::div[contains(@class, 'x1n2onr6')]/div[1]/div/div/h4/div/div/span/span/span"
-                    reply_sender_xpath = "./ancestor::div[contains(@class, 'x1n2onr6')]/div[1]/div/div[1]/div/div/h4/div/div/div/div[2]/span/span"
-                    wait = WebDriverWait(self.driver, 10)
-
-                    while self.export_running.is_set():
-                        try:
-                            visible_messages = messages_container.find_elements(By.XPATH, message_xpath)
+        popup = ctk.CTkToplevel(self.root)
+        popup.title("Batch Export")
+        popup.geometry("700x650")
+        popup.transient(self.root)
+        popup.protocol("WM_DELETE_WINDOW", self._close_batch_window)
+        self.batch_window = popup
 
-                            if not visible_messages:
-                                time.sleep(1)
-                                continue
+        ctk.CTkLabel(
+            popup,
+            text="Paste the conversations to export, one Messenger link or thread ID per line.\n"
+                 "Each chat is saved to its own file in:\n" + self._batch_output_dir(),
+            justify="center"
+        ).pack(pady=(15, 5))
+
+        self.batch_conversations = ctk.CTkTextbox(popup, height=150)
+        self.batch_conversations.pack(fill="x", padx=20, pady=5)
+
+        settings_frame = ctk.CTkFrame(popup, fg_color="transparent")
+        settings_frame.pack(fill="x", padx=20, pady=5)
+
+        ctk.CTkLabel(settings_frame, text="Browsers:").pack(side="left", padx=(0, 5))
+        ctk.CTkOptionMenu(
+            settings_frame,
+            values=["1", "2", "3", "4"],
+            variable=self.batch_workers,
+            width=70
+        ).pack(side="left", padx=(0, 20))
+
+        ctk.CTkLabel(settings_frame, text="Chats loading at once:").pack(side="left", padx=(0, 5))
+        ctk.CTkOptionMenu(
+            settings_frame,
+            values=["1", "2", "3", "4"],
+            variable=self.batch_account_limit,
+            width=70
+        ).pack(side="left")
+
+        ctk.CTkCheckBox(
+            popup,
+            text="Run the browsers in the background (needs a saved or cookie login)",
+            variable=self.batch_headless
+        ).pack(pady=(5, 0))
 
-                            total_visible = len(visible_messages)
-                            processed_in_view = 0
-
-                            for message in visible_messages[::-1]:
-                                if not self.export_running.is_set():
-                                    break
-
-                                message_id = self.get_message_identifier(message)
-                                if message_id and message_id in self.processed_messages:
-                                    processed_in_view += 1
-                                    continue
-
-                                try:
-                                    # Center current message
-                                    actions = ActionChains(self.driver)
-                                    actions.move_to_element(message).perform()
-                                except:
-                                    try:
-                                        self.driver.execute_script(
-                                            "arguments[0].scrollIntoView({block: 'center'});",
-                                            message
-                                        )
-                                    except:
-                                        continue
-
-                                # Reset scroll count when processing messages
-                                scroll_count = 0
-
-                                # Skip pure image messages
-                                has_images = message.find_elements(By.TAG_NAME, "img")
-                                has_image_text = "image" in message.get_attribute("innerHTML").lower()
-                                if has_images and has_image_text and not message.text:
-                                    if message_id:
-                                        self.processed_messages.add(message_id)
-                                    processed_in_view += 1
-                                    continue
-
-                                # Get message content
-                                try:
-                                    sender_name = ""
-                                    if self.chat_type.get() == "group":
-                                        try:
-                                            sender_element = message.find_element(By.XPATH, sender_xpath)
-                                            sender_name = sender_element.text.strip()
-                                        except:
-                                            try:
-                                                sender_element = message.find_element(By.XPATH, reply_sender_xpath)
-                                                sender_name = sender_element.text.strip()
-                                            except:
-                                                sender_name = ""
-
-                                    color = self._get_message_color(message)
-                                    content = self.driver.execute_script("""
-                                        function extractContent(element) {
-                                            var text = '';
-                                            function processNode(node) {
-                                                if (node.nodeType === Node.TEXT_NODE) {
-                                                    text += node.textContent;
-                                                } else if (node.tagName === 'A') {
-                                                    text += node.textContent + ' [' + node.href + '] ';
-                                                } else {
-                                                    for (var i = 0; i < node.childNodes.length; i++) {
-                                                        processNode(node.childNodes[i]);
-                                                    }
-                                                }
-                                            }
-                                            processNode(element);
-                                            return text;
-                                        }
-                                        return extractContent(arguments[0]);
-                                    """, message)
-
-                                    content = content.strip()
-                                    if content:
-                                        message_count += 1
-                                        formatted_message = ""
-
-                                        if self.chat_type.get() != "group":
-                                            color_name = self.rgb_to_color_name(color)
-                                            if color_name == 'Azure':
-                                                color_name = 'You'
-                                            if color_name == 'White':
-                                                color_name = 'Them'
-                                            formatted_message = f"[{color_name}] {sender_name}{content}"
-                                            f.write(formatted_message + "\n")
-                                            f.flush()
-                                        else:
-                                            color_name = self.rgb_to_color_name(color)
-                                            if color_name == 'Azure':
-                                                sender_name = 'You'
-                                            if sender_name != "":
-                                                formatted_message = f"{content}\n[{sender_name}]"
-                                                f.write(formatted_message + "\n")
-                                            else:
-                                                formatted_message = content
-                                                f.write(formatted_message + "\n")
-                                            f.flush()
-
-                                        # Update GUI with the message
-                                        self.message_queue.put({
-                                            'type': 'status',
-                                            'message': formatted_message,
-                                            'level': 'info'
-                                        })
-                                        last_message = formatted_message
-
-                                        if message_id:
-                                            self.processed_messages.add(message_id)
-
-                                        # Update progress every 10 messages
-                                        if message_count % 10 == 0:
-                                            progress_msg = f"Processed {message_count} messages..."
-                                            self.message_queue.put({
-                                                'type': 'status',
-                                                'message': progress_msg,
-                                                'level': 'info'
-                                            })
-                                            last_message = progress_msg
-
-                                except Exception as e:
-                                    self.message_queue.put({
-                                        'type': 'status',
-                                        'message': f'Error processing message: {str(e)}',
-                                        'level': 'warning'
-                                    })
-                                    continue
+        self.batch_button = ctk.CTkButton(
+            popup,
+            text="Start Batch Export",
+            command=self.toggle_batch_export
+        )
+        self.batch_button.pack(pady=10)
+
+        self.batch_progress_label = ctk.CTkLabel(popup, text="")
+        self.batch_progress_label.pack()
+        self.batch_progress_bar = ctk.CTkProgressBar(popup)
+        self.batch_progress_bar.set(0)
+        self.batch_progress_bar.pack(fill="x", padx=20, pady=5)
+
+        self.batch_log = ctk.CTkTextbox(popup, state="disabled")
+        self.batch_log.pack(fill="both", expand=True, padx=20, pady=(5, 15))
+        self.batch_status_log = StatusLog(self.batch_log)
+
+    def _target_per_pass(self):
+        """Messages the export should fit on screen, 0 to leave the zoom alone"""
+        value = self.messages_per_pass.get()
+        return 0 if value == "Off" else int(value)
+
+    def _batch_output_dir(self):
+        return os.path.join(os.path.dirname(self.output_path.get()), "conversations")
+
+    def toggle_batch_export(self):
+        """Start or stop the batch export"""
+        if self.batch_exporter is not None and self.batch_exporter.is_alive():
+            self.batch_exporter.stop()
+            self.batch_button.configure(state="disabled", text="Stopping...")
+            return
 
-                                processed_in_view += 1
+        conversations = []
+        for line in self.batch_conversations.get("1.0", "end").splitlines():
+            if not line.strip():
+                continue
+            try:
+                conversations.append(conversation_url(line))
+            except ValueError as e:
+                self._update_batch_status(str(e), "warning")
+        if not conversations:
+            self._update_batch_status("Add at least one conversation to export.", "warning")
+            return
 
-                            # Scroll handling
-                            if processed_in_view >= total_visible and self.export_running.is_set():
-                                try:
-                                    first_message = visible_messages[0]
-                                    actions = ActionChains(self.driver)
-                                    actions.move_to_element(first_message).perform()
-                                    actions.send_keys(Keys.PAGE_UP).perform()
-                                    time.sleep(2)
-
-                                    # Check if last message was also a scroll message
-                                    if last_message == 'Scrolling to load more messages...':
-                                        scroll_count += 1
-                                    else:
-                                        scroll_count = 0
-
-                                    # Update GUI about scrolling
-                                    self.message_queue.put({
-                                        'type': 'status',
-                                        'message': 'Scrolling to load more messages...',
-                                        'level': 'info'
-                                    })
-                                    last_message = 'Scrolling to load more messages...'
-
-                                    # Show warning popup if multiple scroll attempts
-                                    if scroll_count >= 1:
-                                        self._show_scroll_warning()
-                                        # Reset scroll count after showing warning
-                                        scroll_count = 0
-                                except:
-                                    try:
-                                        self.driver.execute_script("window.scrollBy(0, -1000);")
-                                        time.sleep(2)
-                                    except:
-                                        pass
-
-                        except Exception as e:
-                            self.message_queue.put({
-                                'type': 'status',
-                                'message': f'Error in main loop: {str(e)}',
-                                'level': 'warning'
-                            })
-                            time.sleep(1)
-                            continue
+        cookies = None
+        if self.login_method.get() == "cookies":
+            try:
+                cookies = parse_cookies(self.cookies_textbox.get("1.0", "end").strip())
+            except ValueError as e:
+                self._update_batch_status(f"Cookie validation error: {str(e)}. Using manual login.", "warning")
+
+        self.batch_exporter = BatchExporter(
+            conversations,
+            self._batch_output_dir(),
+            self.events,
+            workers=int(self.batch_workers.get()),
+            per_account_limit=int(self.batch_account_limit.get()),
+            cookies=cookies,
+            job_options={
+                'chat_type': self.chat_type.get(),
+                'extraction_mode': self.extraction_mode.get(),
+                'scroll_mode': self.scroll_mode.get(),
+                'export_mode': self.export_mode.get(),
+                'durability': "message" if self.flush_each_message.get() else "batch",
+                'write_jsonl': self.write_jsonl.get(),
+                'write_database': self.write_database.get(),
+                'block_media': self.block_media.get(),
+                'target_per_pass': self._target_per_pass(),
+                'trim_dom': self.trim_dom.get()
+            },
+            headless=self.batch_headless.get()
+        )
+        self.batch_exporter.start()
+        self.batch_button.configure(text="Stop Batch Export", fg_color="red", hover_color="dark red")
 
-                    # Write session end marker
-                    session_end = f"\n=== Export Session Ended: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n"
-                    f.write(session_end)
-                    f.flush()
-                    self.message_queue.put({
-                        'type': 'status',
-                        'message': session_end.strip(),
-                        'level': 'info'
-                    })
+    def _update_batch_status(self, message, level="info"):
+        """Append a line to the batch log"""
+        if self.batch_window is None or not self.batch_window.winfo_exists():
+            return
+        self.batch_status_log.add(message)
 
-                    # Final summary
-                    summary_msg = f"Export completed! Saved {message_count} messages to {output_file}"
-                    self.message_queue.put({
-                        'type': 'status',
-                        'message': summary_msg,
-                        'level': 'info'
-                    })
+    def _update_batch_progress(self, progress):
+        """Show how many conversations are done, failed and in progress"""
+        if self.batch_window is None or not self.batch_window.winfo_exists():
+            return
+        total = progress['total']
+        finished = progress['done'] + progress['failed']
+        self.batch_progress_label.configure(
+            text=f"{progress['done']} of {total} exported, {progress['failed']} failed, "
+                 f"{progress['running']} in progress"
+        )
+        self.batch_progress_bar.set(finished / total if total else 0)
+
+        if progress['finished']:
+            self.batch_button.configure(
+                text="Start Batch Export",
+                state="normal",
+                fg_color=("blue", "blue"),
+                hover_color=("dark blue", "dark blue")
+            )
 
-        except Exception as e:
-            self.message_queue.put({
-                'type': 'status',
-                'message': f'Critical export error: {str(e)}',
-                'level': 'error'
-            })
-        finally:
-            if not self.export_running.is_set():
-                self._cleanup()
+    def _close_batch_window(self):
+        if self.batch_exporter is not None:
+            self.batch_exporter.stop()
+        self.batch_window.destroy()
+        self.batch_window = None
 
     def get_message_color(self, message):
         """Get the background color of a message"""
@@ -1230,162 +3901,8 @@ class ModernMessengerExporter:
                 return ""
 
     def rgb_to_color_name(self, rgb_string):
-        """Convert RGB color to descriptive name with support for 20+ distinct colors
-
-        Args:
-            rgb_string (str): RGB color in format 'rgb(r,g,b)' or 'rgba(r,g,b,a)'
-
-        Returns:
-            str: Detailed color name description
-        """
-        try:
-            # Parse RGB values
-            rgb_values = rgb_string.strip('rgba()').split(',')
-            r = int(rgb_values[0])
-            g = int(rgb_values[1])
-            b = int(rgb_values[2])
-
-            # Check for grayscale first
-            if max(abs(r - g), abs(r - b), abs(g - b)) < 20:
-                if r < 30:
-                    return "Black"
-                elif r > 225:
-                    return "White"
-                elif r > 160:
-                    return "Light Gray"
-                elif r > 90:
-                    return "Gray"
-                else:
-                    return "Dark Gray"
-
-            # Calculate color dominance
-            max_val = max(r, g, b)
-            min_val = min(r, g, b)
-            delta = max_val - min_val
-
-            # Calculate hue
-            if delta == 0:
-                hue = 0
-            elif max_val == r:
-                hue = 60 * (((g - b) / delta) % 6)
-            elif max_val == g:
-                hue = 60 * (((b - r) / delta) + 2)
-            else:
-                hue = 60 * (((r - g) / delta) + 4)
-
-            # Calculate saturation
-            saturation = 0 if max_val == 0 else (delta / max_val) * 100
-
-            # Calculate value/brightness
-            value = (max_val / 255) * 100
-
-            # Early returns for special cases
-            if saturation < 10:
-                return "Gray"
-            if value < 15:
-                return "Black"
-            elif value > 95 and saturation < 20:
-                return "White"
-
-            # Detailed color determination based on hue ranges
-            if 0 <= hue <= 10 or hue >= 350:
-                if value > 80:
-                    return "Pink" if saturation < 50 else "Red"
-                elif value > 50:
-                    return "Dark Red"
-                else:
-                    return "Maroon"
-
-            elif 10 < hue <= 20:
-                if value > 80:
-                    return "Salmon"
-                else:
-                    return "Dark Salmon"
-
-            elif 20 < hue <= 40:
-                if value > 80:
-                    return "Orange"
-                elif value > 50:
-                    return "Dark Orange"
-                else:
-                    return "Brown"
-
-            elif 40 < hue <= 70:
-                if value > 80:
-                    return "Yellow"
-                elif value > 50:
-                    return "Gold"
-                else:
-                    return "Olive"
-
-            elif 70 < hue <= 100:
-                if value > 80:
-                    return "Lime"
-                elif value > 50:
-                    return "Green"
-                else:
-                    return "Dark Green"
-
-            elif 100 < hue <= 140:
-                if value > 80:
-                    return "Light Green"
-                elif value > 50:
-                    return "Sea Green"
-                else:
-                    return "Forest Green"
-
-            elif 140 < hue <= 170:
-                if value > 80:
-                    return "Aqua"
-                elif value > 50:
-                    return "Teal"
-                else:
-                    return "Dark Teal"
-
-            elif 170 < hue <= 200:
-                if value > 80:
-                    return "Light Blue"
-                elif value > 50:
-                    return "Sky Blue"
-                else:
-                    return "Steel Blue"
-
-            elif 200 < hue <= 240:
-                if value > 80:
-                    return "Azure"
-                elif value > 50:
-                    return "Blue"
-                else:
-                    return "Navy"
-
-            elif 240 < hue <= 280:
-                if value > 80:
-                    return "Violet"
-                elif value > 50:
-                    return "Purple"
-                else:
-                    return "Dark Purple"
-
-            elif 280 < hue <= 320:
-                if value > 80:
-                    return "Magenta"
-                elif value > 50:
-                    return "Hot Pink"
-                else:
-                    return "Deep Pink"
-
-            elif 320 < hue < 350:
-                if value > 80:
-                    return "Light Pink"
-                elif value > 50:
-                    return "Rose"
-                else:
-                    return "Dark Rose"
-
-            return "Unknown"
-
-        except Exception as e:
-            return "Unknown"
+        """Convert RGB color to descriptive name, see rgb_to_color_name()"""
+        return rgb_to_color_name(rgb_string)
 
     def get_sender_name(self, message, color):
         """Get sender name with improved error handling"""
@@ -1415,11 +3932,634 @@ class ModernMessengerExporter:
         except:
             return ""
 
+    def on_close(self):
+        """Stop any export and close the browser along with the window"""
+        self.selenium_running.clear()
+        self.export_running.clear()
+        if self.batch_exporter is not None:
+            self.batch_exporter.stop()
+        self.events.close()
+        self.root.destroy()
+
     def run(self):
         """Start the application"""
-        self.root.mainloop()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.bind("<Map>", self._on_first_map, add="+")
+        try:
+            self.root.mainloop()
+        finally:
+            self.browser.close()
+
+# A transcript message starts with "[label] " or is a session marker, and a
+# group chat message ends with its "[sender]" line
+MESSAGE_START = re.compile(r"^(\[[^\]\n]+\] |=== )")
+SENDER_LINE = re.compile(r"^\[[^\]\n]+\]$")
+
+
+def split_transcript(path, max_bytes=ANALYSIS_CHUNK_BYTES):
+    """Work out where to split a transcript file into chunks, between messages
+
+    The file is read once, a line at a time, keeping only the size of each
+    message. Chunks are packed from the end, where the oldest messages are,
+    so the new messages an incremental export puts at the top leave the
+    other chunks unchanged. A single message longer than max_bytes is cut
+    between lines, or mid-line if it has to be.
+
+    Returns:
+        list: (start, end) byte offsets of each chunk, in file order
+    """
+    pieces = array('Q')  # Byte length of each message, or of each cut of a long one
+    size = 0
+    with open(path, 'rb') as f:
+        for raw in f:
+            line = raw.decode('utf-8', errors='replace')
+            if size and MESSAGE_START.match(line):
+                pieces.append(size)
+                size = 0
+            if size + len(raw) > max_bytes:
+                if size:
+                    pieces.append(size)
+                start = 0
+                while len(raw) - start > max_bytes:
+                    cut = start + max_bytes
+                    while cut > start + 1 and raw[cut] & 0xC0 == 0x80:
+                        cut -= 1  # Keep UTF-8 characters whole
+                    pieces.append(cut - start)
+                    start = cut
+                size = len(raw) - start
+            else:
+                size += len(raw)
+            if SENDER_LINE.match(line.rstrip("\r\n")):
+                pieces.append(size)
+                size = 0
+    if size:
+        pieces.append(size)
+
+    spans = []
+    position = chunk_end = sum(pieces)
+    chunk_size = 0
+    for size in reversed(pieces):
+        if chunk_size + size > max_bytes and chunk_size:
+            spans.append((position, chunk_end))
+            chunk_end = position
+            chunk_size = 0
+        position -= size
+        chunk_size += size
+    if chunk_size:
+        spans.append((position, chunk_end))
+    spans.reverse()
+    return spans
+
+
+def read_transcript_span(path, span):
+    """Read one chunk found by split_transcript()"""
+    start, end = span
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start).decode('utf-8', errors='replace')
+
+
+def _json_envelope(path, piece_chars=65536):
+    """Yield {"chat_content": <file contents>} as JSON, a piece at a time"""
+    yield b'{"chat_content": "'
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        while True:
+            piece = f.read(piece_chars)
+            if not piece:
+                break
+            yield json.dumps(piece)[1:-1].encode('ascii')
+    yield b'"}'
+
+
+def _gzip_stream(pieces):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip framing
+    for piece in pieces:
+        compressed = compressor.compress(piece)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class AnalysisCache:
+    """Analysis results on disk, keyed on a hash of what was analysed
+
+    The key covers the text, the endpoint, the request stage and
+    ANALYSIS_PROMPT_VERSION. Reading an entry marks it as used, and once the
+    cache grows past max_bytes the least recently used entries are removed.
+    """
+
+    def __init__(self, path=None, max_bytes=50 * 1024 * 1024):
+        self.path = path or str(Path.home() / ".messenger_analyzer" / "analysis_cache")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint, stage, text):
+        digest = hashlib.sha256()
+        for part in (endpoint, stage, str(ANALYSIS_PROMPT_VERSION), text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def file_key(endpoint, stage, path):
+        """Same as key() for the text of a UTF-8 file, without loading it"""
+        digest = hashlib.sha256()
+        for part in (endpoint, stage, str(ANALYSIS_PROMPT_VERSION)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached analysis, or None"""
+        entry_path = os.path.join(self.path, key + ".json")
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                analysis = json.load(f)['analysis']
+            os.utime(entry_path)  # Most recently used
+            return analysis
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, analysis):
+        os.makedirs(self.path, exist_ok=True)
+        entry_path = os.path.join(self.path, key + ".json")
+        temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({'analysis': analysis}, f)
+        os.replace(temp_path, entry_path)
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            try:
+                entries = [entry for entry in os.scandir(self.path) if entry.name.endswith(".json")]
+            except OSError:
+                return
+            stats = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries]
+            total = sum(size for _, size, _ in stats)
+            for _, size, entry_path in sorted(stats):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(entry_path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+class AnalysisClient:
+    """HTTP client for the analysis API
+
+    All requests share one pooled requests.Session, so the parts of a long
+    chat reuse their connections. analyze_file() streams a whole transcript
+    with chunked transfer encoding instead of building the body in memory.
+    With compress on, for servers known to accept gzip, bodies over
+    COMPRESS_MIN bytes and all streamed ones are sent gzipped; a 415 reply
+    sends the body again as plain JSON and turns compression off for this
+    client. Connection errors and 5xx
+    responses are retried up to retries times, waiting a random time of up
+    to backoff * 2^attempt seconds.
+    """
+
+    COMPRESS_MIN = 1024
+
+    def __init__(self, endpoint=ANALYSIS_URL, connect_timeout=10, read_timeout=300,
+                 retries=3, backoff=1.0, compress=ANALYSIS_GZIP, pool_size=ANALYSIS_PARALLEL):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.endpoint = endpoint
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.compress = compress
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def analyze(self, payload):
+        """POST a payload and return its analysis text
+
+        Raises:
+            RuntimeError: With the server's error message if it rejected the request
+        """
+        body = json.dumps(payload).encode('utf-8')
+        return self._request(lambda: body)
+
+    def analyze_file(self, path):
+        """POST a transcript file as chat_content, reading it as it is sent
+
+        Memory use stays the same however big the file is.
+        """
+        return self._request(lambda: _json_envelope(path))
+
+    def _request(self, make_body):
+        import requests
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._send(make_body)
+            except requests.exceptions.ConnectionError:
+                if attempt == self.retries:
+                    raise
+                self._wait(attempt)
+                continue
+            if response.status_code >= 500 and attempt < self.retries:
+                self._wait(attempt)
+                continue
+            break
+
+        if response.status_code == 200:
+            return response.json()['analysis']
+        try:
+            error_message = response.json().get('error', 'Unknown error occurred')
+        except ValueError:
+            error_message = f"HTTP {response.status_code}"
+        raise RuntimeError(error_message)
+
+    def _send(self, make_body):
+        """POST the body from make_body(), bytes or an iterator of bytes sent chunked"""
+        headers = {'Content-Type': 'application/json'}
+        body = make_body()
+        streamed = not isinstance(body, bytes)
+        if self.compress and (streamed or len(body) >= self.COMPRESS_MIN):
+            response = self.session.post(
+                self.endpoint,
+                data=_gzip_stream(body) if streamed else gzip.compress(body, compresslevel=6),
+                headers=dict(headers, **{'Content-Encoding': 'gzip'}),
+                timeout=self.timeout
+            )
+            if response.status_code != 415:  # Unsupported Media Type
+                return response
+            self.compress = False
+            body = make_body()
+        return self.session.post(self.endpoint, data=body, headers=headers, timeout=self.timeout)
+
+    def _wait(self, attempt):
+        time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+
+def _post_analysis(client, payload, cache=None):
+    key = None
+    if cache is not None:
+        key = cache.key(client.endpoint, payload.get('stage', 'whole'), payload['chat_content'])
+        analysis = cache.get(key)
+        if analysis is not None:
+            return analysis
+
+    analysis = client.analyze(payload)
+    if key is not None:
+        cache.put(key, analysis)
+    return analysis
+
+
+def _post_transcript(client, path, cache=None):
+    """Analyse a whole transcript in one streamed request"""
+    key = None
+    if cache is not None:
+        key = cache.file_key(client.endpoint, 'whole', path)
+        analysis = cache.get(key)
+        if analysis is not None:
+            return analysis
+
+    analysis = client.analyze_file(path)
+    if key is not None:
+        cache.put(key, analysis)
+    return analysis
+
+
+def _post_part(client, path, span, part, parts, cache=None):
+    # Read here rather than up front, so only the parts in flight are in memory
+    return _post_analysis(client, {
+        'chat_content': read_transcript_span(path, span),
+        'stage': 'map',
+        'part': part,
+        'parts': parts
+    }, cache)
+
+
+def _combine_partials(partials, parts):
+    return "\n\n".join(
+        f"=== Part {first} of {parts} ===\n{partial}" if first == last
+        else f"=== Parts {first}-{last} of {parts} ===\n{partial}"
+        for (first, last), partial in partials
+    )
+
+
+def _group_partials(partials, parts, max_bytes):
+    """Split partial analyses into groups that each fit in one combine request
+
+    Groups are packed from the end, like split_transcript(), so the groups
+    of older parts stay the same, and cached, when new messages come in.
+    Every group but a leftover single one has at least two partials, so each
+    round of combining has fewer of them, even if one is over max_bytes.
+    """
+    groups = []
+    group = []
+    for partial in reversed(partials):
+        candidate = [partial] + group
+        if len(group) >= 2 and len(_combine_partials(candidate, parts).encode('utf-8')) > max_bytes:
+            groups.append(group)
+            candidate = [partial]
+        group = candidate
+    groups.append(group)
+    groups.reverse()
+    return groups
+
+
+def analyze_transcript(path, endpoint=ANALYSIS_URL, chunk_bytes=ANALYSIS_CHUNK_BYTES,
+                       parallel=ANALYSIS_PARALLEL, on_progress=None, cache=None, compress=ANALYSIS_GZIP):
+    """Send an exported transcript to the analysis API
+
+    A transcript of up to chunk_bytes goes in one ordinary request. With
+    chunk_bytes 0 the whole transcript goes in one request streamed from
+    the file with chunked transfer encoding, which needs a server that
+    accepts chunked bodies. Longer ones are split between messages, the parts are
+    analysed in parallel, and the partial analyses are combined. When they
+    are too long to combine in one request, they are combined in groups of
+    at most chunk_bytes first, in as many rounds as it takes. The file is
+    never read into memory whole.
+
+    Args:
+        on_progress (callable): Called with (parts done, parts) as parts finish
+        cache (AnalysisCache): Where to look up and keep results; parts
+            analysed before come back without a request
+        compress (bool): Gzip request bodies, for servers that accept it
+
+    Returns:
+        str: The analysis text
+
+    Raises:
+        RuntimeError: With the server's error message if it rejected a request
+    """
+    spans = split_transcript(path, chunk_bytes) if chunk_bytes > 0 else []
+    with AnalysisClient(endpoint, compress=compress, pool_size=parallel) as client:
+        if chunk_bytes <= 0:
+            return _post_transcript(client, path, cache)
+        if len(spans) <= 1:
+            # Small enough to hold, so send it with a Content-Length like any other request
+            with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+                return _post_analysis(client, {'chat_content': f.read()}, cache)
+
+        partials = [None] * len(spans)
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            futures = {
+                pool.submit(_post_part, client, path, span, index + 1, len(spans), cache): index
+                for index, span in enumerate(spans)
+            }
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    partials[futures[future]] = future.result()
+                    if on_progress:
+                        on_progress(done, len(spans))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+            # Each partial covers the parts (first, last), numbered from 1
+            partials = [((index + 1, index + 1), partial) for index, partial in enumerate(partials)]
+            while True:
+                groups = _group_partials(partials, len(spans), chunk_bytes)
+                combined = list(pool.map(
+                    lambda group: group[0][1] if len(group) == 1 else _post_analysis(client, {
+                        'chat_content': _combine_partials(group, len(spans)),
+                        'stage': 'reduce',
+                        'parts': len(spans)
+                    }, cache),
+                    groups
+                ))
+                if len(groups) == 1:
+                    return combined[0]
+                partials = [
+                    ((group[0][0][0], group[-1][0][1]), partial)
+                    for group, partial in zip(groups, combined)
+                ]
+
+
+def transcript_stats(path):
+    """Summarise an export from the structured .jsonl file written next to it
+
+    Raises:
+        FileNotFoundError: If the export was made without the .jsonl file
+    """
+    structured_file = path if path.endswith(".jsonl") else os.path.splitext(path)[0] + ".jsonl"
+    if not os.path.exists(structured_file):
+        raise FileNotFoundError(f"No structured export at {structured_file}, export with .jsonl enabled")
+
+    stats = {
+        'messages': 0,
+        'senders': {},
+        'images': 0,
+        'links': 0,
+        'characters': 0,
+        'first_captured': None,
+        'last_captured': None
+    }
+    with open(structured_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            stats['messages'] += 1
+            sender = record.get('sender') or record.get('color_name') or 'Unknown'
+            stats['senders'][sender] = stats['senders'].get(sender, 0) + 1
+            stats['images'] += 1 if record.get('has_image') else 0
+            stats['links'] += len(record.get('links') or [])
+            stats['characters'] += len(record.get('content') or '')
+            captured_at = record.get('captured_at')
+            if captured_at:
+                if stats['first_captured'] is None or captured_at < stats['first_captured']:
+                    stats['first_captured'] = captured_at
+                if stats['last_captured'] is None or captured_at > stats['last_captured']:
+                    stats['last_captured'] = captured_at
+    return stats
+
+
+class JsonLinesEvents:
+    """Prints events as one JSON object per line, for scripts and cron jobs"""
+
+    def __init__(self, stream=None, echoes=False):
+        self.stream = stream or sys.stdout
+        self.echoes = echoes
+        self.lock = threading.Lock()
+
+    def put(self, event):
+        if event.get('echo') and not self.echoes:
+            return
+        event = dict(event, time=datetime.now().isoformat(timespec='seconds'))
+        event.pop('coalesce', None)
+        with self.lock:
+            self.stream.write(json.dumps(event) + "\n")
+            self.stream.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Export and analyse Facebook Messenger chats. Run without arguments to open the app."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Export conversations, printing progress as JSON lines")
+    export.add_argument("conversations", nargs="+", help="Messenger links or thread IDs")
+    export.add_argument("--output-dir", default=str(Path.home() / "Downloads" / "conversations"),
+                        help="Where to write <thread id>.txt for each conversation")
+    export.add_argument("--chat-type", choices=["individual", "group"], default="individual")
+    export.add_argument("--mode", choices=["full", "resume", "incremental"], default="full")
+    export.add_argument("--extraction", choices=["batch", "stream", "element"], default="batch")
+    export.add_argument("--scroll", choices=["container", "keys"], default="container")
+    export.add_argument("--cookies", help="JSON cookie export to log in with, instead of the saved login")
+    export.add_argument("--workers", type=int, default=1, help="Browsers to run at once")
+    export.add_argument("--per-account", type=int, default=1, help="Chats to load at once")
+    export.add_argument("--messages-per-pass", type=int, default=50, help="0 leaves the zoom alone")
+    export.add_argument("--no-jsonl", action="store_true", help="Skip the structured .jsonl file")
+    export.add_argument("--database", action="store_true", help="Also add messages to messenger.db")
+    export.add_argument("--flush-each-message", action="store_true")
+    export.add_argument("--keep-media", action="store_true", help="Let the page load images and fonts")
+    export.add_argument("--trim-dom", action="store_true", help="Trim saved messages from the page")
+    export.add_argument("--show-browser", action="store_true", help="Run Chrome in a window")
+    export.add_argument("--verbose", action="store_true", help="Also print every exported message")
+
+    analyze = commands.add_parser("analyze", help="Analyse an exported transcript")
+    analyze.add_argument("transcript")
+    analyze.add_argument("--endpoint", default=ANALYSIS_URL,
+                         help="Analysis API URL, also read from MESSENGER_ANALYSIS_URL")
+    analyze.add_argument("--chunk-bytes", type=int, default=ANALYSIS_CHUNK_BYTES,
+                         help="Largest piece of transcript sent in one request, 0 sends it all at once")
+    analyze.add_argument("--parallel", type=int, default=ANALYSIS_PARALLEL,
+                         help="Requests to run at once")
+    analyze.add_argument("--no-cache", action="store_true",
+                         help="Analyse everything again instead of reusing earlier results")
+    analyze.add_argument("--gzip", action="store_true", default=ANALYSIS_GZIP,
+                         help="Gzip request bodies, only for servers that accept it; "
+                              "also set by MESSENGER_ANALYSIS_GZIP=1")
+
+    stats = commands.add_parser("stats", help="Print message counts for an export")
+    stats.add_argument("transcript")
+    return parser
+
+
+def cli_export(args):
+    events = JsonLinesEvents(echoes=args.verbose)
+    try:
+        conversations = [conversation_url(conversation) for conversation in args.conversations]
+        cookies = None
+        if args.cookies:
+            with open(args.cookies, 'r', encoding='utf-8') as f:
+                cookies = parse_cookies(f.read().strip())
+    except (OSError, ValueError) as e:
+        events.put({'type': 'error', 'message': str(e)})
+        return 2
+
+    exporter = BatchExporter(
+        conversations,
+        args.output_dir,
+        events,
+        workers=args.workers,
+        per_account_limit=args.per_account,
+        cookies=cookies,
+        job_options={
+            'chat_type': args.chat_type,
+            'extraction_mode': args.extraction,
+            'scroll_mode': args.scroll,
+            'export_mode': args.mode,
+            'durability': "message" if args.flush_each_message else "batch",
+            'write_jsonl': not args.no_jsonl,
+            'write_database': args.database,
+            'block_media': not args.keep_media,
+            'target_per_pass': args.messages_per_pass,
+            'trim_dom': args.trim_dom
+        },
+        headless=not args.show_browser
+    )
+    exporter.start()
+    try:
+        while exporter.is_alive():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        exporter.stop()
+        while exporter.is_alive():
+            time.sleep(0.5)
+
+    events.put({
+        'type': 'summary',
+        'done': exporter.done,
+        'failed': exporter.failed,
+        'total': len(conversations)
+    })
+    return 0 if exporter.done == len(conversations) else 1
+
+
+def cli_analyze(args):
+    events = JsonLinesEvents()
+    try:
+        analysis = analyze_transcript(
+            args.transcript,
+            args.endpoint,
+            chunk_bytes=args.chunk_bytes,
+            parallel=args.parallel,
+            cache=None if args.no_cache else AnalysisCache(),
+            compress=args.gzip,
+            on_progress=lambda done, parts: events.put({
+                'type': 'analysis_progress',
+                'done': done,
+                'parts': parts
+            })
+        )
+    except Exception as e:
+        events.put({'type': 'error', 'message': str(e)})
+        return 1
+    events.put({'type': 'analysis', 'analysis': analysis})
+    return 0
+
+
+def cli_stats(args):
+    events = JsonLinesEvents()
+    try:
+        stats = transcript_stats(args.transcript)
+    except (OSError, ValueError) as e:
+        events.put({'type': 'error', 'message': str(e)})
+        return 1
+    events.put(dict(stats, type='stats'))
+    return 0
+
+
+def run_cli(argv):
+    """Run a command line command without loading the GUI
+
+    Returns:
+        int: Exit code
+    """
+    args = build_parser().parse_args(argv)
+    commands = {
+        'export': cli_export,
+        'analyze': cli_analyze,
+        'stats': cli_stats
+    }
+    return commands[args.command](args)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_cli(argv)
 
-def main():
     def handle_exception(exc_type, exc_value, exc_traceback):
         if issubclass(exc_type, KeyboardInterrupt):
             sys.__excepthook__(exc_type, exc_value, exc_traceback)
@@ -1433,9 +4573,10 @@ def main():
 
     sys.excepthook = handle_exception
 
+    load_gui_modules()
     app = ModernMessengerExporter()
     app.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,460 @@
+"""Analysis client tests against a stand-in for the analysis API on 127.0.0.1"""
+import gzip
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            chunked = self.headers.get('Transfer-Encoding') == 'chunked'
+            raw = self._read_chunked() if chunked else self.rfile.read(int(self.headers['Content-Length']))
+            request = {
+                'headers': dict(self.headers),
+                'chunked': chunked,
+                'gzip': self.headers.get('Content-Encoding') == 'gzip',
+                'port': self.client_address[1],
+                'raw': raw
+            }
+            with server.lock:
+                server.requests.append(request)
+            time.sleep(server.delay)
+            status, reply = server.respond(request)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+        body = json.dumps(reply).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_chunked(self):
+        raw = b''
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                return raw
+            raw += self.rfile.read(size)
+            self.rfile.readline()
+
+    def log_message(self, *args):
+        pass
+
+
+def payload_of(request):
+    raw = gzip.decompress(request['raw']) if request['gzip'] else request['raw']
+    return json.loads(raw)
+
+
+def summarise(request):
+    """Answer every request with a short analysis naming what it was sent"""
+    payload = payload_of(request)
+    if payload.get('stage') == 'map':
+        return 200, {'analysis': f"summary of part {payload['part']}"}
+    if payload.get('stage') == 'reduce':
+        return 200, {'analysis': "combined summary"}
+    return 200, {'analysis': "whole summary"}
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(respond=summarise, delay=0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        server.respond = respond
+        server.delay = delay
+        server.requests = []
+        server.lock = threading.Lock()
+        server.in_flight = 0
+        server.max_in_flight = 0
+        server.url = f"http://127.0.0.1:{server.server_port}/analyze"
+        threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def write_transcript(tmp_path, text, name="chat.txt"):
+    path = tmp_path / name
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+
+def chunks_of(path, max_bytes):
+    return [main.read_transcript_span(path, span) for span in main.split_transcript(path, max_bytes)]
+
+
+def individual_chat(messages):
+    return "".join(
+        f"[{'You' if i % 2 else 'Sam'}] message {i}\nwith a second line\n" for i in range(messages)
+    )
+
+
+def group_chat(messages):
+    return "".join(f"message {i}\nwith a second line\n[{'Alice' if i % 2 else 'Bob'}]\n" for i in range(messages))
+
+
+# split_transcript
+
+def test_chunks_cover_the_transcript_within_the_limit(tmp_path):
+    text = individual_chat(200)
+    path = write_transcript(tmp_path, text)
+    chunks = chunks_of(path, 500)
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(len(chunk.encode('utf-8')) <= 500 for chunk in chunks)
+
+
+def test_individual_chat_is_cut_before_a_label_line(tmp_path):
+    path = write_transcript(tmp_path, individual_chat(200))
+    for chunk in chunks_of(path, 500):
+        assert main.MESSAGE_START.match(chunk)
+        assert chunk.endswith("with a second line\n")
+
+
+def test_group_chat_is_cut_after_a_sender_line(tmp_path):
+    path = write_transcript(tmp_path, group_chat(200))
+    for chunk in chunks_of(path, 500):
+        assert chunk.startswith("message ")
+        assert main.SENDER_LINE.match(chunk.splitlines()[-1])
+
+
+def test_session_marker_starts_a_new_message(tmp_path):
+    messages = group_chat(5)
+    marker = "=== Export Session Started: 2024-01-01 10:00:00 ===\n"
+    text = marker + messages + "\n" + marker + messages
+    path = write_transcript(tmp_path, text)
+
+    # Just big enough for the second session, so the cut goes before its marker
+    size = len((marker + messages).encode('utf-8'))
+    chunks = chunks_of(path, size)
+    assert chunks[-1] == marker + messages
+    assert "".join(chunks) == text
+
+
+def test_oversized_message_is_cut_between_characters(tmp_path):
+    long_message = "[You] " + "é€😀 " * 400 + "\n"
+    text = "[Sam] before\n" + long_message + "[Sam] after\n"
+    path = write_transcript(tmp_path, text)
+    chunks = chunks_of(path, 300)
+
+    assert len(chunks) > 4
+    assert all(len(chunk.encode('utf-8')) <= 300 for chunk in chunks)
+    assert all("�" not in chunk for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_new_messages_at_the_top_leave_older_chunks_alone(tmp_path):
+    text = individual_chat(200)
+    before = chunks_of(write_transcript(tmp_path, text), 500)
+    after = chunks_of(write_transcript(tmp_path, "[You] newest\n" + text, "newer.txt"), 500)
+
+    assert after[1:] == before[1:]
+
+
+# analyze_transcript
+
+def test_short_transcript_goes_in_one_request(tmp_path, stand_in):
+    server = stand_in()
+    text = individual_chat(5)
+    path = write_transcript(tmp_path, text)
+
+    assert main.analyze_transcript(path, server.url) == "whole summary"
+    assert len(server.requests) == 1
+    assert payload_of(server.requests[0]) == {'chat_content': text}
+    # An ordinary body, for servers and proxies that cannot read chunked ones
+    assert not server.requests[0]['chunked']
+    assert 'Content-Length' in server.requests[0]['headers']
+
+
+def test_long_transcript_is_mapped_then_reduced(tmp_path, stand_in):
+    server = stand_in()
+    path = write_transcript(tmp_path, individual_chat(200))
+    chunks = chunks_of(path, 2000)
+    parts = len(chunks)
+
+    assert main.analyze_transcript(path, server.url, chunk_bytes=2000) == "combined summary"
+
+    payloads = [payload_of(request) for request in server.requests]
+    maps = sorted((payload for payload in payloads if payload['stage'] == 'map'), key=lambda p: p['part'])
+    assert [payload['chat_content'] for payload in maps] == chunks
+    assert all(payload['parts'] == parts for payload in maps)
+
+    # The reduce request comes last and carries every partial analysis in order
+    reduce = payloads[-1]
+    assert reduce['stage'] == 'reduce'
+    assert reduce['parts'] == parts
+    assert reduce['chat_content'] == "\n\n".join(
+        f"=== Part {part} of {parts} ===\nsummary of part {part}" for part in range(1, parts + 1)
+    )
+
+
+def test_parallel_limits_requests_in_flight(tmp_path, stand_in):
+    server = stand_in(delay=0.05)
+    path = write_transcript(tmp_path, individual_chat(200))
+
+    main.analyze_transcript(path, server.url, chunk_bytes=1000, parallel=2)
+    assert len(server.requests) > 5
+    assert server.max_in_flight == 2
+
+
+def test_progress_is_reported_for_every_part(tmp_path, stand_in):
+    server = stand_in()
+    path = write_transcript(tmp_path, individual_chat(200))
+    parts = len(main.split_transcript(path, 2000))
+    progress = []
+
+    main.analyze_transcript(path, server.url, chunk_bytes=2000,
+                            on_progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(done, parts) for done in range(1, parts + 1)]
+
+
+def test_server_error_message_is_raised(tmp_path, stand_in):
+    server = stand_in(lambda request: (422, {'error': "Chat content is empty"}))
+    path = write_transcript(tmp_path, "[You] hi\n")
+
+    with pytest.raises(RuntimeError, match="Chat content is empty"):
+        main.analyze_transcript(path, server.url)
+
+
+# AnalysisCache
+
+def test_cached_analysis_is_not_requested_again(tmp_path, stand_in):
+    server = stand_in()
+    cache = main.AnalysisCache(str(tmp_path / "cache"))
+    path = write_transcript(tmp_path, individual_chat(200))
+
+    first = main.analyze_transcript(path, server.url, chunk_bytes=2000, cache=cache)
+    requests_made = len(server.requests)
+    second = main.analyze_transcript(path, server.url, chunk_bytes=2000, cache=cache)
+
+    assert second == first
+    assert len(server.requests) == requests_made
+
+
+def test_only_new_parts_are_requested_after_an_incremental_export(tmp_path, stand_in):
+    # Partial analyses that depend on the text, so a changed part changes the reduce input
+    server = stand_in(lambda request: (200, {'analysis': payload_of(request)['chat_content'][:40]}))
+    cache = main.AnalysisCache(str(tmp_path / "cache"))
+    text = individual_chat(200)
+    main.analyze_transcript(write_transcript(tmp_path, text), server.url, chunk_bytes=2000, cache=cache)
+    server.requests.clear()
+
+    newer = write_transcript(tmp_path, "[You] newest\n" + text, "newer.txt")
+    main.analyze_transcript(newer, server.url, chunk_bytes=2000, cache=cache)
+
+    # The first part changed, so it and the combining request go out again
+    stages = sorted(payload_of(request)['stage'] for request in server.requests)
+    assert stages == ['map', 'reduce']
+
+
+def test_cache_is_per_endpoint(tmp_path, stand_in):
+    first, second = stand_in(), stand_in()
+    cache = main.AnalysisCache(str(tmp_path / "cache"))
+    path = write_transcript(tmp_path, "[You] hi\n")
+
+    main.analyze_transcript(path, first.url, cache=cache)
+    main.analyze_transcript(path, second.url, cache=cache)
+    assert len(first.requests) == len(second.requests) == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = main.AnalysisCache(str(tmp_path / "cache"), max_bytes=250)
+    keys = [cache.key("endpoint", "whole", str(i)) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, "x" * 80)
+        os.utime(os.path.join(cache.path, key + ".json"), (i, i))
+
+    cache.put(keys[2], "x" * 80)
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) == "x" * 80
+    assert cache.get(keys[2]) == "x" * 80
+
+
+# AnalysisClient
+
+LARGE = {'chat_content': "[You] hi\n" * 500}  # Over COMPRESS_MIN
+
+
+def test_bodies_are_plain_json_unless_compression_is_on(stand_in):
+    server = stand_in()
+    with main.AnalysisClient(server.url) as client:
+        client.analyze(LARGE)
+
+    assert not server.requests[0]['gzip']
+    assert payload_of(server.requests[0]) == LARGE
+
+
+def test_large_bodies_are_gzipped_and_small_ones_are_not(stand_in):
+    server = stand_in()
+    with main.AnalysisClient(server.url, compress=True) as client:
+        client.analyze(LARGE)
+        client.analyze({'chat_content': "[You] hi\n"})
+
+    assert [request['gzip'] for request in server.requests] == [True, False]
+    assert payload_of(server.requests[0]) == LARGE
+
+
+def test_gzip_refusal_falls_back_to_plain_json(stand_in):
+    def respond(request):
+        if request['gzip']:
+            return 415, {'error': "Unsupported Media Type"}
+        return summarise(request)
+
+    server = stand_in(respond)
+    with main.AnalysisClient(server.url, compress=True) as client:
+        assert client.analyze(LARGE) == "whole summary"
+        assert not client.compress
+        client.analyze(LARGE)
+
+    assert [request['gzip'] for request in server.requests] == [True, False, False]
+
+
+def test_bad_requests_are_not_sent_again(stand_in):
+    server = stand_in(lambda request: (400, {'error': "Chat content is too long"}))
+    with main.AnalysisClient(server.url, compress=True) as client:
+        with pytest.raises(RuntimeError, match="too long"):
+            client.analyze(LARGE)
+        assert client.compress
+
+    assert len(server.requests) == 1
+
+
+def test_server_errors_are_retried(stand_in):
+    failures = [503, 502]
+
+    def respond(request):
+        if failures:
+            return failures.pop(), {'error': "busy"}
+        return summarise(request)
+
+    server = stand_in(respond)
+    with main.AnalysisClient(server.url, backoff=0.001) as client:
+        assert client.analyze(LARGE) == "whole summary"
+    assert len(server.requests) == 3
+
+
+def test_retries_give_up_with_the_last_error(stand_in):
+    server = stand_in(lambda request: (503, {'error': "busy"}))
+    with main.AnalysisClient(server.url, retries=2, backoff=0.001) as client:
+        with pytest.raises(RuntimeError, match="busy"):
+            client.analyze(LARGE)
+    assert len(server.requests) == 3
+
+
+def test_requests_share_pooled_connections(stand_in):
+    server = stand_in()
+    with main.AnalysisClient(server.url) as client:
+        for _ in range(5):
+            client.analyze(LARGE)
+    ports = {request['port'] for request in server.requests}
+    assert len(ports) == 1
+
+
+# Streamed uploads
+
+def test_whole_transcript_is_streamed_chunked_and_gzipped(tmp_path, stand_in):
+    server = stand_in()
+    text = individual_chat(2000) + 'quotes " and \\ backslashes, tabs\t and émoji 😀\n'
+    path = write_transcript(tmp_path, text)
+
+    assert main.analyze_transcript(path, server.url, chunk_bytes=0, compress=True) == "whole summary"
+    request, = server.requests
+    assert request['chunked'] and request['gzip']
+    assert 'Content-Length' not in request['headers']
+    assert payload_of(request) == {'chat_content': text}
+
+
+def test_streamed_upload_falls_back_to_plain_json(tmp_path, stand_in):
+    def respond(request):
+        if request['gzip']:
+            return 415, {'error': "Unsupported Media Type"}
+        return summarise(request)
+
+    server = stand_in(respond)
+    text = individual_chat(500)
+    path = write_transcript(tmp_path, text)
+
+    assert main.analyze_transcript(path, server.url, chunk_bytes=0, compress=True) == "whole summary"
+    assert [(request['chunked'], request['gzip']) for request in server.requests] == [(True, True), (True, False)]
+    assert payload_of(server.requests[1]) == {'chat_content': text}
+
+
+def test_streamed_upload_is_rebuilt_for_each_retry(tmp_path, stand_in):
+    failures = [503]
+
+    def respond(request):
+        if failures:
+            return failures.pop(), {'error': "busy"}
+        return summarise(request)
+
+    server = stand_in(respond)
+    text = individual_chat(500)
+    path = write_transcript(tmp_path, text)
+    with main.AnalysisClient(server.url, backoff=0.001) as client:
+        assert client.analyze_file(path) == "whole summary"
+
+    assert len(server.requests) == 2
+    assert all(payload_of(request) == {'chat_content': text} for request in server.requests)
+
+
+def test_streamed_transcript_shares_the_cache_key_of_its_text(tmp_path):
+    text = individual_chat(50) + "émoji 😀\n"
+    path = write_transcript(tmp_path, text)
+    assert main.AnalysisCache.file_key("endpoint", "whole", path) == main.AnalysisCache.key("endpoint", "whole", text)
+
+
+# Combining in rounds
+
+def test_partials_too_long_for_one_request_are_combined_in_rounds(tmp_path, stand_in):
+    def respond(request):
+        payload = payload_of(request)
+        if payload['stage'] == 'map':
+            return 200, {'analysis': f"summary of part {payload['part']} " + "x" * 300}
+        return 200, {'analysis': f"combined {len(payload['chat_content'])} " + "y" * 300}
+
+    server = stand_in(respond)
+    path = write_transcript(tmp_path, individual_chat(400))
+    parts = len(main.split_transcript(path, 1000))
+
+    main.analyze_transcript(path, server.url, chunk_bytes=1000)
+    reduces = [payload_of(request) for request in server.requests if payload_of(request)['stage'] == 'reduce']
+
+    assert len(reduces) > 2
+    assert all(len(reduce['chat_content'].encode('utf-8')) <= 1000 for reduce in reduces)
+    # Later rounds name the range of parts each partial covers
+    assert any("=== Parts 1-" in reduce['chat_content'] for reduce in reduces)
+    assert all(reduce['parts'] == parts for reduce in reduces)
+
+
+def test_grouping_keeps_older_groups_when_a_part_is_added():
+    partials = [((i, i), "z" * 100) for i in range(1, 21)]
+    before = main._group_partials(partials, 20, 500)
+    after = main._group_partials([((0, 0), "z" * 100)] + partials, 20, 500)
+
+    assert all(len(group) >= 2 for group in before)
+    assert after[-len(before) + 1:] == before[1:]
@@ -0,0 +1,42 @@
+import queue
+import threading
+
+import main
+
+
+def make_job(output_file):
+    return main.ChatExportJob(None, str(output_file), queue.Queue(), threading.Event())
+
+
+def test_resume_drops_messages_written_after_the_checkpoint(tmp_path):
+    output_file = tmp_path / "chat.txt"
+    jsonl_file = tmp_path / "chat.jsonl"
+    job = make_job(output_file)
+
+    output_file.write_text("=== Export Session Started ===\n[You] one\n", encoding="utf-8")
+    jsonl_file.write_text('{"seq": 1}\n', encoding="utf-8")
+    job.processed_messages.add(1)
+    job._save_checkpoint(None, str(output_file), "https://example.com/t/1", 1, 1)
+
+    # Flushed after the checkpoint, then the export crashed
+    with open(output_file, "a", encoding="utf-8") as f:
+        f.write("[You] two\n")
+    with open(jsonl_file, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2}\n')
+
+    checkpoint = job._load_checkpoint(str(output_file), "https://example.com/t/1")
+    assert checkpoint['message_count'] == 1
+    job._truncate(str(output_file), checkpoint['transcript_size'])
+    job._truncate(str(jsonl_file), checkpoint['jsonl_size'])
+
+    assert output_file.read_text(encoding="utf-8") == "=== Export Session Started ===\n[You] one\n"
+    assert jsonl_file.read_text(encoding="utf-8") == '{"seq": 1}\n'
+
+
+def test_checkpoint_from_another_conversation_is_ignored(tmp_path):
+    output_file = tmp_path / "chat.txt"
+    output_file.write_text("", encoding="utf-8")
+    job = make_job(output_file)
+    job._save_checkpoint(None, str(output_file), "https://example.com/t/1", 0, None)
+
+    assert job._load_checkpoint(str(output_file), "https://example.com/t/2") is None
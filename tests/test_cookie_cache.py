@@ -0,0 +1,39 @@
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+import main
+
+COOKIES = [
+    {'name': 'c_user', 'value': '1', 'domain': '.facebook.com'},
+    {'name': 'xs', 'value': 'secret', 'domain': '.facebook.com', 'expiry': time.time() + 86400}
+]
+
+
+def test_round_trip(tmp_path):
+    cache = main.CookieCache(str(tmp_path / "cookies.json"))
+    cache.save(COOKIES)
+    assert cache.load() == COOKIES
+
+
+def test_expiring_session_is_not_loaded(tmp_path):
+    cache = main.CookieCache(str(tmp_path / "cookies.json"))
+    cache.save([COOKIES[0], dict(COOKIES[1], expiry=time.time() + 10)])
+    assert cache.load() is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+def test_saved_file_is_private_even_with_a_loose_umask(tmp_path):
+    path = tmp_path / "cookies.json"
+    # A stale temp file from a crash must not keep its permissions
+    (tmp_path / "cookies.json.tmp").write_text("")
+    os.chmod(tmp_path / "cookies.json.tmp", 0o644)
+    old_umask = os.umask(0o022)
+    try:
+        main.CookieCache(str(path)).save(COOKIES)
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
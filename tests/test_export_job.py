@@ -0,0 +1,154 @@
+"""Runs ChatExportJob against a scripted chat instead of a browser"""
+import queue
+import threading
+
+import pytest
+
+import main
+
+YOU = "rgb(0, 132, 255)"
+
+
+@pytest.fixture(autouse=True)
+def selenium_names():
+    main.load_selenium()
+
+
+class FakeDriver:
+    current_url = "https://www.facebook.com/messages/t/1"
+
+    def find_element(self, *args):
+        return object()
+
+    def execute_script(self, *args):
+        return None
+
+    def execute_cdp_cmd(self, *args):
+        return None
+
+
+class ScriptedJob(main.ChatExportJob):
+    """Shows the newest `visible` messages of a chat and reveals older ones on scroll
+
+    History stops loading below `oldest_loadable`, as if Messenger gave up.
+    """
+
+    def __init__(self, tmp_path, messages, visible=5, oldest_loadable=0, **options):
+        options.setdefault('interactive', False)
+        super().__init__(FakeDriver(), str(tmp_path / "chat.txt"), queue.Queue(), threading.Event(), **options)
+        self.running.set()
+        self.messages = messages  # (fingerprint or None, text), oldest first
+        self.start = max(len(messages) - visible, oldest_loadable)
+        self.visible = visible
+        self.oldest_loadable = oldest_loadable
+
+    def _extract_visible_messages(self, messages_container, message_xpath, sender_xpaths):
+        records = [
+            {
+                'node_id': index + 1,
+                'fingerprint': [0, fingerprint] if fingerprint is not None else None,
+                'edge': False,
+                'color': YOU,
+                'sender': "",
+                'content': text,
+                'text': text,
+                'links': [],
+                'has_image': False
+            }
+            for index, (fingerprint, text) in enumerate(self.messages)
+            if index >= self.start
+        ]
+        return records, (object() if records else None)
+
+    def _scroll_up(self, messages_container, first_message, fraction=0.9):
+        older = max(self.start - self.visible, self.oldest_loadable)
+        self.loaded = older < self.start
+        self.start = older
+
+    def _wait_for_older_messages(self, scheduler, messages_container, anchor, message_xpath, warn=True):
+        if not self.loaded:
+            self.finished = True
+        return self.loaded
+
+    def statuses(self):
+        return [event.get('message', '') for event in list(self.events.queue)]
+
+
+def chat(count, first=0):
+    return [(i + 1, f"message {i}") for i in range(first, first + count)]
+
+
+def transcript_lines(tmp_path):
+    return [line for line in (tmp_path / "chat.txt").read_text(encoding="utf-8").splitlines()
+            if line.startswith("[")]
+
+
+def test_full_export_saves_every_message(tmp_path):
+    job = ScriptedJob(tmp_path, chat(12))
+    assert job.run()
+    assert len(transcript_lines(tmp_path)) == 12
+
+
+def test_incremental_export_adds_new_messages(tmp_path):
+    assert ScriptedJob(tmp_path, chat(10)).run()
+
+    job = ScriptedJob(tmp_path, chat(15), export_mode="incremental")
+    assert job.run()
+    assert len(transcript_lines(tmp_path)) == 15
+
+
+def test_incremental_export_that_stops_short_keeps_the_baseline(tmp_path):
+    assert ScriptedJob(tmp_path, chat(10)).run()
+    before = (tmp_path / "chat.txt").read_text(encoding="utf-8")
+
+    # History stops loading two messages short of the last export
+    job = ScriptedJob(tmp_path, chat(15), export_mode="incremental", oldest_loadable=12)
+    assert not job.run()
+    assert (tmp_path / "chat.txt").read_text(encoding="utf-8") == before
+    assert any("left unchanged" in message for message in job.statuses())
+
+    # The next run still goes all the way back to the last export
+    job = ScriptedJob(tmp_path, chat(15), export_mode="incremental")
+    assert job.run()
+    assert len(transcript_lines(tmp_path)) == 15
+
+
+def test_incremental_export_survives_messages_without_fingerprint(tmp_path):
+    assert ScriptedJob(tmp_path, chat(10)).run()
+
+    messages = chat(10) + [(None, "unidentified")] + chat(4, first=10)
+    job = ScriptedJob(tmp_path, messages, export_mode="incremental")
+    assert job.run()
+    assert not any("Error in main loop" in message for message in job.statuses())
+    # Without a fingerprint it cannot be told apart on later passes, so it may
+    # be written more than once, but everything else is there once
+    assert len(set(transcript_lines(tmp_path))) == 15
+
+
+def test_export_that_cannot_save_reports_the_failure(tmp_path, monkeypatch):
+    def full_disk(self, entries):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(main.JsonlSink, 'write_batch', full_disk)
+    job = ScriptedJob(tmp_path, chat(12))
+    assert not job.run()
+
+    statuses = job.statuses()
+    assert any("No space left" in message for message in statuses)
+    assert not any("Export completed" in message for message in statuses)
+    assert not (tmp_path / "chat.txt.checkpoint").exists()
+
+
+def test_debug_output_stays_off_stdout(tmp_path, capsys):
+    class StaleDriver(FakeDriver):
+        def execute_script(self, *args):
+            raise RuntimeError("stale element reference")
+
+    job = ScriptedJob(tmp_path, chat(1))
+    job.driver = StaleDriver()
+    assert not job._scroll_container(object(), object())
+
+    # The command line prints JSON lines on stdout, nothing else may go there
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert "stale element reference" in err
@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+import main
+
+
+class ListSink:
+    def __init__(self):
+        self.entries = []
+
+    def write_batch(self, entries):
+        self.entries.extend(entries)
+
+    def flush(self):
+        pass
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FullDiskSink(ListSink):
+    def write_batch(self, entries):
+        raise OSError(28, "No space left on device")
+
+
+def test_entries_reach_every_sink_in_order():
+    sink = ListSink()
+    with main.ExportWriter([sink], batch_size=3) as writer:
+        for seq in range(1, 8):
+            writer.write({'seq': seq})
+        writer.sync()
+        assert writer.committed == 7
+    assert [entry['seq'] for entry in sink.entries] == list(range(1, 8))
+
+
+def test_sink_failure_is_raised_as_export_write_error():
+    writer = main.ExportWriter([FullDiskSink()], durability="message")
+    with pytest.raises(main.ExportWriteError):
+        with writer:
+            writer.write({'seq': 1})
+            with pytest.raises(main.ExportWriteError, match="No space left"):
+                writer.sync()
+            # Every later write fails too, so the export loop has to give up
+            with pytest.raises(main.ExportWriteError):
+                writer.write({'seq': 2})
+
+
+def test_database_keeps_one_row_per_fingerprint(tmp_path):
+    path = str(tmp_path / "messenger.db")
+    entries = [
+        {'seq': 1, 'fingerprint': "00000000000000aa", 'sender': None, 'content': "hi",
+         'captured_at': "2024-01-01T00:00:00"},
+        {'seq': 2, 'fingerprint': None, 'sender': None, 'content': "no fingerprint",
+         'captured_at': "2024-01-01T00:00:00"}
+    ]
+    for _ in range(2):
+        sink = main.SqliteSink(path, "https://example.com/t/1")
+        sink.write_batch(entries)
+        sink.close()
+
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT fingerprint, content FROM messages").fetchall()
+    finally:
+        conn.close()
+    assert rows == [("00000000000000aa", "hi")]
+
+
+def test_failure_while_closing_is_raised():
+    writer = main.ExportWriter([FullDiskSink()])
+    with pytest.raises(main.ExportWriteError):
+        with writer:
+            writer.write({'seq': 1})  # Still queued when the writer closes
+    with pytest.raises(main.ExportWriteError):
+        writer.sync()
@@ -0,0 +1,50 @@
+"""Builds the window with the Tk modules mocked, so it runs without a display"""
+from unittest import mock
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def app(monkeypatch):
+    for name in ('tk', 'ttk', 'messagebox', 'ctk'):
+        monkeypatch.setattr(main, name, mock.MagicMock(), raising=False)
+    return main.ModernMessengerExporter(prewarm=False)
+
+
+def test_first_frame_needs_only_step_one(app):
+    assert not app.started
+    assert list(app.step_frames) == [1]
+    assert app.current_step == 1
+
+
+def test_later_steps_are_built_on_demand(app):
+    app._finish_startup()
+    assert sorted(app.step_frames) == [1, 2, 3, 4]
+
+    for step in (2, 3, 4, 1):
+        app.show_step(step)
+        assert app.current_step == step
+
+
+def test_showing_step_four_first_builds_the_rest(app):
+    app.show_step(4)
+    assert app.started
+    app.analyze_button.pack.assert_called_with(side="right")
+
+
+def test_rest_of_startup_waits_for_the_window_to_map(app):
+    app.run()
+    app.root.bind.assert_any_call("<Map>", app._on_first_map, add="+")
+    assert not app.started
+
+    # Maps of child widgets are not the window appearing
+    app._on_first_map(mock.Mock(widget=object()))
+    app.root.after.assert_not_called()
+
+    app._on_first_map(mock.Mock(widget=app.root))
+    delay, callback = app.root.after.call_args[0]
+    assert delay == app.STARTUP_DELAY_MS
+    callback()
+    app.root.after_idle.assert_called_once_with(app._finish_startup)
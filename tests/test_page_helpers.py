@@ -0,0 +1,128 @@
+"""Runs PAGE_HELPERS_JS under Node against a stand-in for the message list"""
+import json
+import shutil
+import subprocess
+
+import pytest
+
+import main
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+
+# Just enough DOM for extract() and seek(): every message is a flat element
+# whose key comes from its colour and text, and any XPath finds all of them.
+HARNESS = """
+var messages = JSON.parse(process.argv[1]).map(function (message) {
+    return {
+        color: message[0],
+        innerText: message[1],
+        childNodes: [{nodeType: 3, textContent: message[1]}],
+        getElementsByTagName: function () { return []; }
+    };
+});
+globalThis.window = globalThis;
+globalThis.Node = {ELEMENT_NODE: 1, TEXT_NODE: 3};
+globalThis.XPathResult = {ORDERED_NODE_SNAPSHOT_TYPE: 7, FIRST_ORDERED_NODE_TYPE: 9};
+globalThis.getComputedStyle = function (element) {
+    return {backgroundColor: element.color};
+};
+globalThis.document = {
+    evaluate: function () {
+        return {
+            snapshotLength: messages.length,
+            snapshotItem: function (i) { return messages[i]; }
+        };
+    }
+};
+%s
+var helpers = window.__messengerExporter;
+if (process.argv[2]) {
+    var seek = JSON.parse(process.argv[2]);
+    var result = helpers.seek({}, './/div', [], seek.target, seek.checked);
+    console.log(JSON.stringify({found: result.found, checked: result.checked}));
+} else {
+    console.log(JSON.stringify(helpers.extract({}, './/div', []).records.map(function (record) {
+        return {fingerprint: record.fingerprint, edge: record.edge};
+    })));
+}
+"""
+
+THEM = "rgb(240, 240, 240)"
+YOU = "rgb(0, 132, 255)"
+
+
+def run_helpers(messages, *args):
+    completed = subprocess.run(
+        ["node", "-e", HARNESS % main.PAGE_HELPERS_JS, json.dumps(messages)]
+        + [json.dumps(arg) for arg in args],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(completed.stdout)
+
+
+def extract(messages):
+    return run_helpers(messages)
+
+
+def seek(messages, target, checked=0):
+    return run_helpers(messages, {'target': target, 'checked': checked})
+
+
+def day(n):
+    return [
+        (THEM, f"how was day {n}?"),
+        (YOU, f"fine, did thing {n}"),
+        (THEM, "nice"),
+        (THEM, "good night"),
+        (YOU, "night")
+    ]
+
+
+def test_repeated_exchange_gets_new_fingerprints():
+    messages = day(1) + day(2) + day(3)
+    records = extract(messages)
+
+    final = [tuple(record['fingerprint']) for record in records if not record['edge']]
+    assert len(final) == len(set(final))
+    # The second and third "good night" / "night" are both final and distinct
+    assert not records[8]['edge'] and not records[13]['edge']
+    assert records[8]['fingerprint'] != records[13]['fingerprint']
+
+
+def test_fingerprints_do_not_change_as_history_loads():
+    messages = day(2) + day(3)
+    before = extract(messages)
+    after = extract(day(1) + messages + day(4))
+
+    offset = len(day(1))
+    for i, record in enumerate(before):
+        if not record['edge']:
+            assert after[offset + i]['fingerprint'] == record['fingerprint']
+
+
+def test_oldest_messages_wait_for_context():
+    records = extract(day(1))
+    assert [record['edge'] for record in records] == [True, True, True, True, False]
+
+
+def test_seek_matches_extract():
+    messages = day(1) + day(2) + day(3)
+    records = extract(messages)
+
+    assert seek(messages, records[8]['fingerprint'])['found']
+    assert seek(messages, records[13]['fingerprint'])['found']
+    # Already checked messages are not looked at again
+    assert not seek(messages, records[13]['fingerprint'], checked=3)['found']
+
+
+def test_seek_rechecks_messages_left_at_the_edge():
+    messages = day(2) + day(3)
+    result = seek(messages, [0, 0])
+    assert not result['found']
+    assert result['checked'] == len(messages) - 4
+
+    older = day(1) + messages
+    target = extract(older)[len(day(1)) + 3]['fingerprint']  # Was at the edge before
+    assert seek(older, target, result['checked'])['found']